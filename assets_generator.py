@@ -4,6 +4,7 @@
 """
 
 from PIL import Image, ImageDraw, ImageFont
+import json
 import os
 from pathlib import Path
 
@@ -17,6 +18,13 @@ BALLS_DIR = IMAGES_DIR / "balls"
 PADDLES_DIR = IMAGES_DIR / "paddles"
 BUTTONS_DIR = IMAGES_DIR / "buttons"
 SOUNDS_DIR = ASSETS_DIR / "sounds"
+ATLAS_IMAGE = IMAGES_DIR / "atlas.png"
+ATLAS_INDEX = IMAGES_DIR / "atlas.json"
+
+ATLAS_WIDTH = 512  # мінімальна ширина атласу; висота - скільки займуть полиці
+ATLAS_PADDING = 2  # прозорий проміжок між спрайтами
+# Що пакується в атлас: каталог -> префікс назви, як у ResourceManager
+ATLAS_GROUPS = ((BALLS_DIR, "ball_"), (PADDLES_DIR, "paddle_"), (BUTTONS_DIR, "btn_"))
 
 # Створити директорії
 for directory in [BG_DIR, BALLS_DIR, PADDLES_DIR, BUTTONS_DIR, SOUNDS_DIR]:
@@ -144,6 +152,36 @@ def create_ui_panel(filename, width=600, height=400, title=""):
     print(f"✓ Створено: {filename}")
 
 
+def create_atlas(image_path=ATLAS_IMAGE, index_path=ATLAS_INDEX):
+    """Упакувати м'ячі, платформи й кнопки в один атлас з JSON-індексом прямокутників"""
+    sprites = []
+    for directory, prefix in ATLAS_GROUPS:
+        for img_file in sorted(directory.glob("*.png")):
+            sprites.append((f"{prefix}{img_file.stem}", Image.open(img_file).convert('RGBA')))
+    
+    # Пакування полицями: спочатку найвищі, новий ряд - коли не вміщається по ширині
+    sprites.sort(key=lambda sprite: (-sprite[1].height, sprite[0]))
+    width = max([ATLAS_WIDTH] + [img.width for _, img in sprites])
+    rects = {}
+    x = y = shelf = 0
+    for name, img in sprites:
+        if x + img.width > width:
+            x, y, shelf = 0, y + shelf + ATLAS_PADDING, 0
+        rects[name] = [x, y, img.width, img.height]
+        x += img.width + ATLAS_PADDING
+        shelf = max(shelf, img.height)
+    
+    atlas = Image.new('RGBA', (width, max(y + shelf, 1)), (0, 0, 0, 0))
+    for name, img in sprites:
+        atlas.paste(img, (rects[name][0], rects[name][1]))
+    atlas.save(image_path)
+    
+    with open(index_path, 'w', encoding='utf-8') as f:
+        json.dump({"image": Path(image_path).name, "sprites": rects}, f, ensure_ascii=False, indent=2)
+    
+    print(f"✓ Створено: {image_path} ({len(rects)} спрайтів, {atlas.width}x{atlas.height})")
+
+
 def create_skin_data():
     """Створити конфіг скінів"""
     skin_config = {
@@ -283,6 +321,10 @@ def generate_all_assets():
     create_ui_panel(str(IMAGES_DIR / "ui_settings.png"), title="НАЛАШТУВАННЯ")
     create_ui_panel(str(IMAGES_DIR / "ui_shop.png"), width=700, height=500, title="МАГАЗИН СКІНІВ")
     
+    # Атлас спрайтів
+    print("\n🧩 Атлас:")
+    create_atlas()
+    
     # Конфіг скінів
     print("\n⚙️  Конфіг:")
     create_skin_data()
@@ -5,14 +5,25 @@
 
 import pygame
 from pathlib import Path
+from threading import Thread
 from typing import Optional
 
+# Звукові ефекти (WAV формат для швидкої відповіді)
+SOUND_FILES = {
+    'platform_hit': 'paddle_hit.wav',
+    'wall_hit': 'wall_hit.wav',
+    'score': 'score.wav',
+    'menu_click': 'menu_click.wav',
+}
+
 
 class AudioManager:
     """Менеджер для управління звуками та музикою"""
     
     def __init__(self, enabled: bool = True):
         self.enabled = enabled
+        # Знайдені файли ефектів; у sounds - вже декодовані (None - не вдалося)
+        self.sound_files = {}
         self.sounds = {}
         self.current_music = None
         self.volume = 0.8
@@ -24,28 +35,16 @@ class AudioManager:
         self._load_sounds()
     
     def _load_sounds(self):
-        """Завантажити всі звукові ефекти та музику"""
+        """Знайти звукові ефекти та музику.
+        Ефекти декодуються при першому відтворенні або заздалегідь (prefetch)"""
         sounds_dir = Path(__file__).parent / "assets" / "sounds"
         
-        print("🔊 Завантаження звуків...")
-        
-        # Звукові ефекти (WAV формат для швидкої відповіді)
-        sound_files = {
-            'platform_hit': 'paddle_hit.wav',
-            'wall_hit': 'wall_hit.wav',
-            'score': 'score.wav',
-            'menu_click': 'menu_click.wav',
-        }
+        print("🔊 Пошук звуків...")
         
-        for sound_key, filename in sound_files.items():
+        for sound_key, filename in SOUND_FILES.items():
             filepath = sounds_dir / filename
             if filepath.exists():
-                try:
-                    self.sounds[sound_key] = pygame.mixer.Sound(str(filepath))
-                    print(f"  ✓ {sound_key} завантажено")
-                except Exception as e:
-                    print(f"  ❌ Помилка при завантаженні {filename}: {e}")
-                    self.sounds[sound_key] = None
+                self.sound_files[sound_key] = filepath
             else:
                 print(f"  ⚠️  {filename} не знайдено")
                 self.sounds[sound_key] = None
@@ -60,6 +59,31 @@ class AudioManager:
         print(f"  ⚠️  background_music не знайдено")
         self.music_path = None
     
+    def _load_sound(self, sound_key: str) -> Optional[pygame.mixer.Sound]:
+        """Декодувати звук, якщо він ще не завантажений"""
+        if sound_key in self.sounds:
+            return self.sounds[sound_key]
+        filepath = self.sound_files.get(sound_key)
+        if filepath is None:
+            return None
+        try:
+            sound = pygame.mixer.Sound(str(filepath))
+            print(f"  ✓ {sound_key} завантажено")
+        except Exception as e:
+            print(f"  ❌ Помилка при завантаженні {filepath.name}: {e}")
+            sound = None
+        return self.sounds.setdefault(sound_key, sound)
+    
+    def prefetch(self, sound_keys):
+        """Декодувати звуки у фоновому потоці до того, як вони знадобляться"""
+        sound_keys = [key for key in sound_keys if key in self.sound_files and key not in self.sounds]
+        if sound_keys:
+            Thread(target=self._prefetch, args=(sound_keys,), daemon=True).start()
+    
+    def _prefetch(self, sound_keys):
+        for sound_key in sound_keys:
+            self._load_sound(sound_key)
+    
     def play_sound(self, sound_key: str):
         """
         Відтворити звуковий ефект
@@ -70,10 +94,11 @@ class AudioManager:
         if not self.enabled:
             return
         
-        if sound_key in self.sounds and self.sounds[sound_key] is not None:
+        sound = self._load_sound(sound_key)
+        if sound is not None:
             try:
-                self.sounds[sound_key].set_volume(self.volume)
-                self.sounds[sound_key].play()
+                sound.set_volume(self.volume)
+                sound.play()
             except Exception as e:
                 print(f"Помилка при відтворенні звуку {sound_key}: {e}")
     
@@ -9,13 +9,33 @@ import json
 from threading import Thread
 from pathlib import Path
 import sys
+from collections import deque
 
 # Імпортувати модулі UI
-from ui_manager import ResourceManager, GameMenu, PlayerSettings, SkinShop, Button
+from ui_manager import ResourceManager, GameMenu, PlayerSettings, SkinShop, Button, text_cache
 from audio_manager import AudioManager
+from protocol import (
+    FrameDecoder, PROTOCOL_BINARY, SUPPORTED_PROTOCOLS, TRANSPORT_TCP, TRANSPORT_UDP, SnapshotDecoder,
+    INPUT_ACK, INPUT_FRAMED, KEY_DOWN, KEY_UP, MSG_INPUT_ACK, decode_datagram, encode_input, encode_keyframe_request,
+    encode_udp_hello,
+)
+from simulation import PADDLE_MAX_Y, PADDLE_MIN_Y, PADDLE_SPEED
 
 # --- PYGAME НАЛАШТУВАННЯ ---
 WIDTH, HEIGHT = 800, 600
+SERVER_ADDRESS = ('localhost', 8080)
+USE_UDP = True  # просити сервер надсилати знімки по UDP, якщо він це підтримує
+UDP_HELLO_ATTEMPTS = 12  # привітань UDP (раз на 0.25 с) без відповіді, після яких лишаємось на TCP
+INPUT_RESEND_INTERVAL = 100  # мс; стан клавіш повторюється, навіть якщо не змінився
+PLAYER_REGION = "eu"  # регіон і рівень гри для підбору суперника
+PLAYER_SKILL = 1000
+PREDICTION_HISTORY = 120  # скільки непідтверджених кадрів введення пам'ятати
+SNAPSHOT_BUFFER = 32  # знімків у кільцевому буфері для інтерполяції
+INTERPOLATION_TICKS = 2  # на скільки тіків сервера малюємо в минулому
+MAX_EXTRAPOLATION = 0.1  # секунд, на які можна продовжити рух м'яча без нових знімків
+CLOCK_SMOOTHING = 0.02  # як швидко оцінка годинника сервера підлаштовується до більшої затримки
+DEFAULT_TICK_RATE = 60
+DIRTY_RECTS = True  # у грі перемальовувати й оновлювати на екрані лише ділянки, що змінилися
 init()
 screen = display.set_mode((WIDTH, HEIGHT))
 clock = time.Clock()
@@ -33,9 +53,32 @@ font_title = font.Font(None, 80)
 
 # --- ГЛОБАЛЬНІ ЗМІННІ ---
 game_state = {}
-buffer = ""
+buffer = b""
 client = None
+udp_client = None
+udp_token = None
+udp_confirmed = False  # по UDP вже прийшов хоч один пакет - введення можна слати ним
+input_seq = 0
+sent_keys = None
+last_input_time = 0
 my_id = None
+protocol = None
+# Передбачення своєї платформи: чи підтверджує сервер введення, положення, клавіші
+# минулого кадру, положення на момент відправки кожного кадру і підтвердження
+server_acks = False
+predicted_y = None
+predicted_keys = 0
+prediction_history = {}
+input_acks = deque()
+# Інтерполяція: останні знімки, частота тіків сервера і локальний час його тіку 0
+snapshot_buffer = deque(maxlen=SNAPSHOT_BUFFER)
+tick_rate = DEFAULT_TICK_RATE
+tick_base = None
+# Нерухомий шар гри (фон із рахунком і написами), написи на ньому і ділянки,
+# зайняті платформами й м'ячем на минулому кадрі. None - перемалювати весь екран
+game_layer = None
+game_labels = None
+drawn_rects = None
 game_over = False
 current_screen = "MENU"  # MENU, SETTINGS, SHOP, CONNECTING, GAME, WIN
 player_name = ""
@@ -45,112 +88,394 @@ selected_paddle_skin = "paddle_magenta"
 # --- СЕРВЕР ---
 def connect_to_server():
     """Підключитися до сервера"""
-    global client, my_id, buffer, game_state
+    global client, udp_client, udp_token, udp_confirmed, my_id, buffer, game_state, protocol, input_seq, sent_keys
+    global predicted_y, predicted_keys, prediction_history, tick_rate, tick_base, server_acks
     
     while True:
         try:
             client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            client.connect(('localhost', 8080))
-            buffer = ""
+            client.connect(SERVER_ADDRESS)
+            buffer = b""
             game_state = {}
-            my_id = int(client.recv(24).decode())
+            udp_client = None
+            udp_confirmed = False
+            input_seq = 0
+            sent_keys = None
+            server_acks = False
+            predicted_y = None
+            predicted_keys = 0
+            prediction_history = {}
+            input_acks.clear()
+            snapshot_buffer.clear()
+            tick_base = None
             
-            # Відправити інформацію про гравця
+            # Відправити інформацію про гравця і підтримувані формати
             player_info = {
                 "name": player_name,
                 "ball_skin": selected_ball_skin,
-                "paddle_skin": selected_paddle_skin
+                "paddle_skin": selected_paddle_skin,
+                "protocols": list(SUPPORTED_PROTOCOLS),
+                "transports": [TRANSPORT_UDP, TRANSPORT_TCP] if USE_UDP else [TRANSPORT_TCP],
+                "input": INPUT_FRAMED,
+                "checksum": True,
+                "region": PLAYER_REGION,
+                "skill": PLAYER_SKILL
             }
             client.send(json.dumps(player_info).encode() + b'\n')
             
-            print(f"✓ Підключено до сервера. ID: {my_id}")
+            # Сервер відповідає рядком з нашим ID та обраним форматом
+            while b"\n" not in buffer:
+                data = client.recv(1024)
+                if not data:
+                    raise ConnectionError("сервер закрив з'єднання")
+                buffer += data
+            line, buffer = buffer.split(b"\n", 1)
+            welcome = json.loads(line)
+            my_id = welcome["id"]
+            protocol = welcome["protocol"]
+            tick_rate = welcome.get("tick_rate", DEFAULT_TICK_RATE)
+            server_acks = welcome.get("acks") is True
+            
+            # Сервер погодився на UDP: знімки і введення підуть окремим сокетом
+            if "udp_port" in welcome:
+                udp_token = bytes.fromhex(welcome["udp_token"])
+                udp_client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                udp_client.connect((SERVER_ADDRESS[0], welcome["udp_port"]))
+                udp_client.settimeout(0.25)
+            
+            transport = "UDP" if udp_client else "TCP"
+            print(f"✓ Підключено до сервера. ID: {my_id}, формат: {protocol}, транспорт: {transport}")
             return True
         except Exception as e:
             print(f"❌ Помилка підключення: {e}")
             return False
 
 
+def apply_state(state):
+    """Прийняти новий стан гри від сервера"""
+    global game_state, tick_base
+    # Знімок міг прийти і по UDP, і по TCP - старіші за поточний ігноруємо
+    if "tick" in state and state["tick"] <= game_state.get("tick", -1):
+        return
+    game_state = state
+    
+    if "tick" in state:
+        snapshot_buffer.append(state)
+        # Локальний час тіку 0: запізнілий знімок дає більшу оцінку, тому беремо
+        # мінімум, а повільне підлаштування вгору враховує зростання затримки
+        base = pygame.time.get_ticks() / 1000 - state["tick"] / tick_rate
+        if tick_base is None or base < tick_base:
+            tick_base = base
+        else:
+            tick_base += (base - tick_base) * CLOCK_SMOOTHING
+    
+    # Відтворити звукові ефекти
+    if game_state.get('sound_event'):
+        audio_manager.play_sound(game_state['sound_event'])
+
+
 def receive():
     """Отримувати дані від сервера"""
-    global buffer, game_state, game_over, current_screen
+    global buffer, game_state, game_over, current_screen, client, udp_client
+    
+    # Сокети й формат цього матчу. Після перепідключення глобальні client і
+    # udp_client належать уже новому матчу, і цей потік їх не чіпає
+    sock, udp_sock, stream_protocol = client, udp_client, protocol
+    decoder = FrameDecoder()
+    snapshots = SnapshotDecoder()
+    # Дані, що прийшли разом із привітанням, обробляються першими
+    data, buffer = buffer, b""
+    lines = b""
     
-    while not game_over and client:
+    while not game_over and sock is client:
         try:
-            data = client.recv(1024).decode()
             if not data:
-                break
+                data = sock.recv(1024)
+                if not data or sock is not client:
+                    break
             
-            buffer += data
-            while "\n" in buffer:
-                packet, buffer = buffer.split("\n", 1)
-                if packet.strip():
-                    game_state = json.loads(packet)
-                    
-                    # Відтворити звукові ефекти
-                    if game_state.get('sound_event'):
-                        audio_manager.play_sound(game_state['sound_event'])
+            if stream_protocol == PROTOCOL_BINARY:
+                for msg_type, payload in decoder.feed(data):
+                    if msg_type == MSG_INPUT_ACK:
+                        input_acks.append(INPUT_ACK.unpack(payload))
+                        continue
+                    state = snapshots.apply(msg_type, payload)
+                    if state is not None:
+                        apply_state(state)
+                if snapshots.desynced:
+                    # Стан розійшовся із серверним - просимо повний знімок
+                    snapshots.desynced = False
+                    print(f"⚠️ Контрольна сума не збіглася (тік {snapshots.tick}, розбіжностей за матч: "
+                          f"{snapshots.mismatches}), запит повного знімка")
+                    sock.send(encode_keyframe_request())
+            else:
+                lines += data
+                while b"\n" in lines:
+                    packet, lines = lines.split(b"\n", 1)
+                    if packet.strip():
+                        apply_state(json.loads(packet))
+            data = b""
         except:
-            if current_screen == "GAME":
+            if current_screen == "GAME" and sock is client:
                 game_state["winner"] = -1
             break
+    
+    # Керуючий канал закрився - сокети цього матчу більше не потрібні, і
+    # введення на них не надсилається
+    if sock is client:
+        client = None
+        if udp_client is udp_sock:
+            udp_client = None
+    sock.close()
+    if udp_sock:
+        udp_sock.close()
 
 
-def draw_game(screen):
-    """Малювати ігрове поле"""
-    if not game_state:
+def receive_udp():
+    """Отримувати знімки по UDP; до першого пакета повторювати привітання.
+    Якщо UDP так і не відповів, матч лишається на TCP"""
+    global udp_client, udp_confirmed
+    sock = udp_client
+    snapshots = SnapshotDecoder()
+    hello = encode_udp_hello(udp_token)
+    confirmed = False
+    attempts = 0
+    
+    while not game_over and sock is udp_client:
+        try:
+            if not confirmed:
+                if attempts == UDP_HELLO_ATTEMPTS:
+                    print("⚠️ UDP не відповідає, гра йде по TCP")
+                    udp_client = None
+                    sock.close()
+                    break
+                attempts += 1
+                sock.send(hello)
+            frame = decode_datagram(sock.recv(2048))
+        except socket.timeout:
+            continue
+        except OSError:
+            if confirmed:
+                break
+            continue  # "порт недоступний" до першої відповіді - така сама невдала спроба
+        if frame is None:
+            continue
+        if not confirmed:
+            confirmed = True
+            # Шлях UDP працює в обидва боки - введення теж піде ним
+            if sock is udp_client:
+                udp_confirmed = True
+        if frame[0] == MSG_INPUT_ACK:
+            input_acks.append(INPUT_ACK.unpack(frame[1]))
+            continue
+        state = snapshots.apply(*frame)
+        if state is not None:
+            apply_state(state)
+
+
+def send_input(keys):
+    """Надіслати маску утримуваних клавіш, лише якщо вона змінилась або настав час повтору"""
+    global input_seq, sent_keys, last_input_time
+    now = pygame.time.get_ticks()
+    if keys == sent_keys and now - last_input_time < INPUT_RESEND_INTERVAL:
+        return
+    input_seq += 1
+    sent_keys = keys
+    last_input_time = now
+    frame = encode_input(input_seq, game_state.get("tick", 0), keys)
+    sock, udp_sock = client, udp_client
+    try:
+        # До першого пакета по UDP введення йде по TCP: UDP може бути заблокований
+        if udp_sock and udp_confirmed:
+            udp_sock.send(frame)
+        elif sock:
+            sock.send(frame)
+    except OSError:
+        # З'єднання щойно закрилось; receive() сам завершить матч
+        return
+    if predicted_y is not None:
+        prediction_history[input_seq] = predicted_y
+        if len(prediction_history) > PREDICTION_HISTORY:
+            del prediction_history[next(iter(prediction_history))]
+
+
+def move_paddle(y, keys, dt):
+    """Те саме правило руху платформи, що й у PongSimulation.move_paddles"""
+    if keys & KEY_UP and not keys & KEY_DOWN:
+        return max(PADDLE_MIN_Y, y - PADDLE_SPEED * dt)
+    if keys & KEY_DOWN and not keys & KEY_UP:
+        return min(PADDLE_MAX_Y, y + PADDLE_SPEED * dt)
+    return y
+
+
+def predict_paddle(keys):
+    """Рухати свою платформу одразу, не чекаючи відповіді сервера"""
+    global predicted_y, predicted_keys
+    paddles = game_state.get("paddles")
+    if not paddles or my_id is None or not server_acks:
+        # Без підтверджень (реплей, старий сервер) передбачення нема з чим звірити -
+        # платформа береться зі знімків
         return
+    if predicted_y is None:
+        predicted_y = float(paddles[str(my_id)])
     
-    # Фон
-    bg = resource_manager.get_image("bg_main")
+    # Звірка: сервер повідомляє, де була платформа, коли він застосував кадр
+    # введення; різниця з нашим положенням на момент відправки - похибка передбачення
+    while input_acks:
+        seq, server_y = input_acks.popleft()
+        sent_y = prediction_history.pop(seq, None)
+        if sent_y is None:
+            continue
+        drift = server_y - sent_y
+        # Біля краю поправка може винести платформу за межі поля
+        predicted_y = min(PADDLE_MAX_Y, max(PADDLE_MIN_Y, predicted_y + drift))
+        for pending in list(prediction_history):
+            if pending < seq:
+                del prediction_history[pending]
+            else:
+                prediction_history[pending] += drift
+    
+    # Рух за клавішами, що утримувались протягом минулого кадру
+    predicted_y = move_paddle(predicted_y, predicted_keys, clock.get_time() / 1000)
+    predicted_keys = keys
+
+
+def interpolated_view():
+    """М'яч і платформи на момент трохи в минулому, між двома знімками сервера.
+
+    Кадри малюються рівно навіть при нерівномірному надходженні пакетів і
+    низькій частоті тіків сервера; якщо нових знімків немає, м'яч ще до
+    MAX_EXTRAPOLATION секунд рухається за своєю швидкістю.
+    """
+    snapshots = list(snapshot_buffer)
+    if not snapshots or tick_base is None:
+        return game_state
+    render_tick = (pygame.time.get_ticks() / 1000 - tick_base) * tick_rate - INTERPOLATION_TICKS
+    
+    older = newer = None
+    for snapshot in snapshots:
+        if snapshot["tick"] <= render_tick:
+            older = snapshot
+        else:
+            newer = snapshot
+            break
+    if older is None:
+        return newer
+    if newer is None:
+        ahead = min((render_tick - older["tick"]) / tick_rate, MAX_EXTRAPOLATION)
+        ball = older["ball"]
+        return {
+            "ball": {"x": ball["x"] + ball["vx"] * ahead, "y": ball["y"] + ball["vy"] * ahead},
+            "paddles": older["paddles"],
+        }
+    if older["scores"] != newer["scores"]:
+        return newer  # після голу м'яч переноситься в центр - без проміжних кадрів
+    
+    alpha = (render_tick - older["tick"]) / (newer["tick"] - older["tick"])
+    
+    def lerp(a, b):
+        return a + (b - a) * alpha
+    
+    return {
+        "ball": {
+            "x": lerp(older["ball"]["x"], newer["ball"]["x"]),
+            "y": lerp(older["ball"]["y"], newer["ball"]["y"]),
+        },
+        "paddles": {
+            pid: lerp(older["paddles"][pid], newer["paddles"][pid]) for pid in ("0", "1")
+        },
+    }
+
+
+def paddle_y(view, pid):
+    if pid == my_id and predicted_y is not None:
+        return predicted_y
+    return view['paddles'][str(pid)]
+
+
+def build_game_layer(labels):
+    """Фон гри з рахунком та інформацією про гравців в одній поверхні"""
+    layer = Surface((WIDTH, HEIGHT)).convert()
+    bg = resource_manager.get_image("bg_main", (WIDTH, HEIGHT))
     if bg:
-        bg = pygame.transform.scale(bg, (WIDTH, HEIGHT))
-        screen.blit(bg, (0, 0))
+        layer.blit(bg, (0, 0))
     else:
-        screen.fill((30, 30, 30))
+        layer.fill((30, 30, 30))
     
-    # Платформи
-    left_paddle_skin = resource_manager.get_image(f"paddle_{selected_paddle_skin}")
-    if left_paddle_skin:
-        paddle_y = game_state['paddles']['0']
-        left_paddle_skin = pygame.transform.scale(left_paddle_skin, (20, 100))
-        screen.blit(left_paddle_skin, (20, paddle_y))
+    # Рахунок
+    score_text, player_info = labels
+    score_rect = score_text.get_rect(center=(WIDTH // 2, 20))
+    layer.blit(score_text, score_rect)
+    
+    # Інформація про гравців
+    layer.blit(player_info, (10, 10))
+    return layer
+
+
+def draw_game(screen):
+    """Малювати ігрове поле.
+    Повертає список ділянок екрана, які треба оновити"""
+    global game_layer, game_labels, drawn_rects
+    if not game_state:
+        return [screen.get_rect()]
+    view = interpolated_view()
+    
+    # Написи беруться з кешу, тож ті самі об'єкти означають незмінний текст
+    labels = (
+        text_cache.render(
+            font_large,
+            f"{game_state['scores'][0]} : {game_state['scores'][1]}", 
+            True, (255, 255, 255)
+        ),
+        text_cache.render(font_small, f"Гравець: {player_name}", True, (200, 200, 255)),
+    )
+    full = not DIRTY_RECTS or drawn_rects is None or labels != game_labels
+    if labels != game_labels:
+        game_layer = build_game_layer(labels)
+        game_labels = labels
+    
+    # Нерухомий шар: повністю лише на першому кадрі та при зміні написів,
+    # інакше - тільки там, де минулого кадру були платформи й м'яч
+    if full:
+        screen.blit(game_layer, (0, 0))
     else:
-        draw.rect(screen, (0, 255, 0), (20, game_state['paddles']['0'], 20, 100))
+        for rect in drawn_rects:
+            screen.blit(game_layer, rect, rect)
+    
+    sprites = [
+        Rect(20, paddle_y(view, 0), 20, 100),
+        Rect(WIDTH - 40, paddle_y(view, 1), 20, 100),
+        Rect(view['ball']['x'] - 10, view['ball']['y'] - 10, 20, 20),
+    ]
     
-    right_paddle_skin = resource_manager.get_image(f"paddle_{selected_paddle_skin}")
-    if right_paddle_skin:
-        paddle_y = game_state['paddles']['1']
-        right_paddle_skin = pygame.transform.scale(right_paddle_skin, (20, 100))
-        screen.blit(right_paddle_skin, (WIDTH - 40, paddle_y))
+    # Платформи
+    paddle_skin = resource_manager.get_image(f"paddle_{selected_paddle_skin}", (20, 100))
+    if paddle_skin:
+        screen.blit(paddle_skin, sprites[0])
+        screen.blit(paddle_skin, sprites[1])
     else:
-        draw.rect(screen, (255, 0, 255), (WIDTH - 40, game_state['paddles']['1'], 20, 100))
+        draw.rect(screen, (0, 255, 0), sprites[0])
+        draw.rect(screen, (255, 0, 255), sprites[1])
     
     # М'яч
-    ball_skin = resource_manager.get_image(f"ball_{selected_ball_skin}")
+    ball_skin = resource_manager.get_image(f"ball_{selected_ball_skin}", (20, 20))
     if ball_skin:
-        ball_skin = pygame.transform.scale(ball_skin, (20, 20))
-        screen.blit(ball_skin, (game_state['ball']['x'] - 10, game_state['ball']['y'] - 10))
+        screen.blit(ball_skin, sprites[2])
     else:
-        draw.circle(screen, (255, 255, 255), (game_state['ball']['x'], game_state['ball']['y']), 10)
+        draw.circle(screen, (255, 255, 255), (view['ball']['x'], view['ball']['y']), 10)
     
-    # Рахунок
-    score_text = font_large.render(
-        f"{game_state['scores'][0]} : {game_state['scores'][1]}", 
-        True, (255, 255, 255)
-    )
-    score_rect = score_text.get_rect(center=(WIDTH // 2, 20))
-    screen.blit(score_text, score_rect)
-    
-    # Інформація про гравців
-    player_info = font_small.render(f"Гравець: {player_name}", True, (200, 200, 255))
-    screen.blit(player_info, (10, 10))
+    # Координати дробові - беремо ділянки з запасом
+    sprites = [rect.inflate(2, 2) for rect in sprites]
+    dirty = [screen.get_rect()] if full else drawn_rects + sprites
+    drawn_rects = sprites
+    return dirty
 
 
 def draw_countdown(screen):
     """Малювати відлік перед грою"""
     if "countdown" in game_state and game_state["countdown"] > 0:
         screen.fill((0, 0, 0))
-        countdown_text = font_title.render(str(game_state["countdown"]), True, (255, 255, 255))
+        countdown_text = text_cache.render(font_title, str(game_state["countdown"]), True, (255, 255, 255))
         screen.blit(countdown_text, (WIDTH // 2 - 30, HEIGHT // 2 - 50))
         return True
     return False
@@ -167,33 +492,47 @@ def draw_win_screen(screen, you_winner):
         text = "ТИ ПРОГРАВ! 😢"
         color = (255, 100, 100)
     
-    win_text = font_title.render(text, True, color)
+    win_text = text_cache.render(font_title, text, True, color)
     text_rect = win_text.get_rect(center=(WIDTH // 2, HEIGHT // 2))
     screen.blit(win_text, text_rect)
     
-    restart_text = font_main.render('Натисни K для рестарту', True, color)
+    restart_text = text_cache.render(font_main, 'Натисни K для рестарту', True, color)
     text_rect = restart_text.get_rect(center=(WIDTH // 2, HEIGHT // 2 + 120))
     screen.blit(restart_text, text_rect)
 
 
 def draw_waiting_screen(screen):
     """Малювати екран очікування"""
-    bg = resource_manager.get_image("bg_main")
+    bg = resource_manager.get_image("bg_main", (WIDTH, HEIGHT))
     if bg:
-        bg = pygame.transform.scale(bg, (WIDTH, HEIGHT))
         screen.blit(bg, (0, 0))
     else:
         screen.fill((20, 20, 40))
     
-    waiting_text = font_main.render("Очікування гравців...", True, (200, 200, 255))
+    waiting_text = text_cache.render(font_main, "Очікування гравців...", True, (200, 200, 255))
     screen.blit(waiting_text, (WIDTH // 2 - waiting_text.get_width() // 2, HEIGHT // 2))
     
     # Анімована точка
     dots = (int(clock.get_time() / 500) % 4)
-    dots_text = font_main.render("." * dots, True, (200, 200, 255))
+    dots_text = text_cache.render(font_main, "." * dots, True, (200, 200, 255))
     screen.blit(dots_text, (WIDTH // 2 - 30, HEIGHT // 2 + 100))
 
 
+def prefetch_assets(screen_name):
+    """Підвантажити у фоні ресурси екрана, на який гравець найімовірніше перейде"""
+    if screen_name == "MENU":
+        resource_manager.prefetch(["bg_settings", "ui_shop"])
+        audio_manager.prefetch(["menu_click"])
+    elif screen_name in ("SETTINGS", "CONNECTING"):
+        # З налаштувань гравець іде в гру - готуємо фон, обрані скіни і звуки матчу
+        resource_manager.prefetch([
+            "bg_main", f"paddle_{selected_paddle_skin}", f"ball_{selected_ball_skin}",
+        ])
+        audio_manager.prefetch(["platform_hit", "wall_hit", "score"])
+    elif screen_name == "SHOP":
+        resource_manager.prefetch(["bg_menu"])
+
+
 # --- ГОЛОВНІ МЕНЮ ОБЪЕКТИ ---
 game_menu = GameMenu(resource_manager, WIDTH, HEIGHT)
 player_settings = PlayerSettings(resource_manager, WIDTH, HEIGHT)
@@ -205,9 +544,10 @@ audio_manager.play_music(loop=True)
 # --- ГОЛОВНА ГРА ЦИКЛ ---
 def main_loop():
     global current_screen, game_over, player_name, selected_ball_skin, selected_paddle_skin
-    global my_id, client
+    global my_id, client, drawn_rects
     
     you_winner = None
+    prefetched_screen = None
     
     # Ініціалізувати UI об'єкти
     player_settings = PlayerSettings(resource_manager, WIDTH, HEIGHT)
@@ -259,6 +599,8 @@ def main_loop():
                         connect_to_server()
                         if my_id is not None:
                             Thread(target=receive, daemon=True).start()
+                            if udp_client:
+                                Thread(target=receive_udp, daemon=True).start()
                             current_screen = "GAME"
                         audio_manager.play_sound("menu_click")
             
@@ -278,15 +620,19 @@ def main_loop():
                     game_state.clear()
                     player_settings = PlayerSettings(resource_manager, WIDTH, HEIGHT)
         
-        # КЕРУВАННЯ ПЛАТФОРМОЮ (постійна перевірка натиснутих клавіш)
-        if current_screen == "GAME" and client:
+        # КЕРУВАННЯ ПЛАТФОРМОЮ (постійна перевірка натиснутих клавіш), поки матч триває
+        if current_screen == "GAME" and client and game_state.get("winner") is None:
             keys = key.get_pressed()
-            if keys[K_w]:
-                client.send(b"UP")
-            elif keys[K_s]:
-                client.send(b"DOWN")
+            held = (KEY_UP if keys[K_w] else 0) | (KEY_DOWN if keys[K_s] else 0)
+            predict_paddle(held)
+            send_input(held)
+        
+        if current_screen != prefetched_screen:
+            prefetch_assets(current_screen)
+            prefetched_screen = current_screen
         
         # МАЛЮВАННЯ
+        dirty = None
         if current_screen == "MENU":
             local_game_menu.draw(screen, font_main, font_title)
         
@@ -304,16 +650,21 @@ def main_loop():
                     you_winner = game_state["winner"] == my_id
                 draw_win_screen(screen, you_winner)
             elif game_state:
-                draw_game(screen)
+                dirty = draw_game(screen)
             else:
                 draw_waiting_screen(screen)
         
         elif current_screen == "CONNECTING":
             screen.fill((0, 0, 0))
-            connecting_text = font_main.render("Підключення до сервера...", True, (255, 255, 255))
+            connecting_text = text_cache.render(font_main, "Підключення до сервера...", True, (255, 255, 255))
             screen.blit(connecting_text, (WIDTH // 2 - connecting_text.get_width() // 2, HEIGHT // 2))
         
-        display.update()
+        if dirty is None:
+            # Інші екрани малюються повністю; наступний кадр гри - теж
+            drawn_rects = None
+            display.update()
+        else:
+            display.update(dirty)
         clock.tick(60)
 
 
@@ -0,0 +1,124 @@
+"""
+Черга підбору суперників для Пінг-Понгу
+Гравці групуються в кошики за регіоном і/або рівнем гри з player_info.
+Кожен кошик - OrderedDict у порядку приходу, тож постановка в чергу,
+вибір найдовше очікуючого і вихід з черги мають складність O(1)
+навіть при тисячах одночасних підключень.
+"""
+
+import argparse
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+# Критерії підбору: FIFO ігнорує все, інші можна поєднувати ("region,skill")
+PAIRING_FIFO = "fifo"
+PAIRING_REGION = "region"
+PAIRING_SKILL = "skill"
+PAIRING_CRITERIA = (PAIRING_REGION, PAIRING_SKILL)
+
+DEFAULT_REGION = "any"
+DEFAULT_SKILL = 1000
+SKILL_BUCKET = 200  # ширина кошика рівня гри
+SKILL_WIDEN_AFTER = 10.0  # секунд, після яких гравця можна звести з сусіднього кошика рівня
+MAX_REGION_LENGTH = 32
+
+
+def parse_pairing(value: str) -> tuple:
+    """Тип аргументу --pairing: рядок ("fifo", "skill", "region,skill") у кортеж критеріїв"""
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    if names in ([], [PAIRING_FIFO]):
+        return ()
+    for name in names:
+        if name not in PAIRING_CRITERIA:
+            raise argparse.ArgumentTypeError(f"невідомий критерій підбору: {name} (є: fifo, {', '.join(PAIRING_CRITERIA)})")
+    # Рівень гри завжди останній у ключі кошика - по ньому шукаються сусіди
+    return tuple(name for name in PAIRING_CRITERIA if name in names)
+
+
+class Lobby:
+    """Черга відкритих місць, згрупованих у кошики.
+
+    Місце (ticket) - будь-який хешований об'єкт: на сервері це матч з одним
+    гравцем, у супервізорі - номер місця у воркері. Новий гравець займає
+    найстаріше місце свого кошика або відкриває нове.
+    """
+
+    def __init__(self, criteria: tuple = ()):
+        self.criteria = criteria
+        self.queues: Dict[tuple, OrderedDict] = {}
+        self.bucket_of: Dict[Hashable, tuple] = {}
+        self.metrics = {
+            "joined": 0,
+            "paired": 0,
+            "abandoned": 0,     # вийшли з черги, не дочекавшись суперника
+            "total_wait": 0.0,
+            "max_wait": 0.0,
+        }
+
+    def bucket(self, player_info: dict) -> tuple:
+        key = []
+        if PAIRING_REGION in self.criteria:
+            region = player_info.get("region")
+            key.append(str(region)[:MAX_REGION_LENGTH] if region else DEFAULT_REGION)
+        if PAIRING_SKILL in self.criteria:
+            try:
+                skill = int(player_info.get("skill", DEFAULT_SKILL))
+            except (TypeError, ValueError, OverflowError):
+                # Не число, NaN або нескінченність (JSON 1e999)
+                skill = DEFAULT_SKILL
+            key.append(skill // SKILL_BUCKET)
+        return tuple(key)
+
+    def pop(self, player_info: dict) -> Optional[Hashable]:
+        """Забрати найстаріше відкрите місце для гравця або None"""
+        self.metrics["joined"] += 1
+        now = time.monotonic()
+        key = self.bucket(player_info)
+        queue = self.queues.get(key)
+        if not queue and PAIRING_SKILL in self.criteria:
+            # Власний кошик порожній: беремо сусідній, якщо там довго чекають
+            for delta in (-1, 1):
+                neighbour = self.queues.get(key[:-1] + (key[-1] + delta,))
+                if neighbour and now - next(iter(neighbour.values())) >= SKILL_WIDEN_AFTER:
+                    queue, key = neighbour, key[:-1] + (key[-1] + delta,)
+                    break
+        if not queue:
+            return None
+        ticket, since = queue.popitem(last=False)
+        if not queue:
+            del self.queues[key]
+        del self.bucket_of[ticket]
+        wait = now - since
+        self.metrics["paired"] += 1
+        self.metrics["total_wait"] += wait
+        self.metrics["max_wait"] = max(self.metrics["max_wait"], wait)
+        return ticket
+
+    def push(self, player_info: dict, ticket: Hashable):
+        """Відкрити місце, на яке сяде наступний гравець того ж кошика"""
+        key = self.bucket(player_info)
+        self.queues.setdefault(key, OrderedDict())[ticket] = time.monotonic()
+        self.bucket_of[ticket] = key
+
+    def remove(self, ticket: Hashable):
+        """Гравець пішов, не дочекавшись суперника"""
+        key = self.bucket_of.pop(ticket, None)
+        if key is None:
+            return
+        queue = self.queues[key]
+        del queue[ticket]
+        if not queue:
+            del self.queues[key]
+        self.metrics["abandoned"] += 1
+
+    def waiting(self) -> int:
+        return len(self.bucket_of)
+
+    def stats(self) -> dict:
+        stats = dict(self.metrics)
+        stats["waiting"] = self.waiting()
+        stats["avg_wait"] = round(stats["total_wait"] / stats["paired"], 3) if stats["paired"] else 0.0
+        stats["total_wait"] = round(stats["total_wait"], 3)
+        stats["max_wait"] = round(stats["max_wait"], 3)
+        return stats
@@ -0,0 +1,344 @@
+"""
+Мережевий протокол Пінг-Понгу
+Бінарні знімки стану гри (повні та дельта) і JSON як запасний формат
+"""
+
+import json
+import re
+import struct
+import zlib
+from typing import List, Optional, Tuple
+
+from simulation import KEY_DOWN, KEY_UP
+
+# Формати, які сервер може обрати під час рукостискання (у порядку переваги)
+PROTOCOL_BINARY = "bin1"
+PROTOCOL_JSON = "json"
+SUPPORTED_PROTOCOLS = (PROTOCOL_BINARY, PROTOCOL_JSON)
+
+# Заголовок кожного бінарного кадру: тип повідомлення і довжина тіла
+FRAME_HEADER = struct.Struct("!BH")
+MSG_SNAPSHOT = 1
+MSG_DELTA = 2
+MSG_UDP_HELLO = 3
+MSG_INPUT = 4
+MSG_CHECKSUM = 5
+MSG_KEYFRAME_REQUEST = 6
+MSG_INPUT_ACK = 7
+
+# Транспорти для знімків і введення; керуючий канал завжди TCP
+TRANSPORT_UDP = "udp"
+TRANSPORT_TCP = "tcp"
+
+# Поля знімка: Y платформ, м'яч (x, y, vx, vy), рахунок, відлік,
+# переможець (-1 - немає) та прапорці подій
+FIELD_FORMATS = "hhffffBBBbB"
+FIELD_STRUCTS = [struct.Struct("!" + fmt) for fmt in FIELD_FORMATS]
+EVENTS_FIELD = len(FIELD_FORMATS) - 1
+
+# Повний знімок: тік і всі поля
+SNAPSHOT = struct.Struct("!I" + FIELD_FORMATS)
+
+# Дельта: тік, тік базового знімка, маска змінених полів; далі лише змінені поля.
+# Події не "липкі" - їх немає в дельті, якщо за тік нічого не сталося
+DELTA_HEADER = struct.Struct("!IIH")
+
+# Контрольна сума стану після тіку: CRC32 полів у тому вигляді, як вони йдуть у
+# знімок (float32, цілі платформи), без прапорців подій. Клієнт, що попросив
+# "checksum" у player_info, отримує її по TCP після дельти кожні CHECKSUM_INTERVAL
+# тіків і при розбіжності просить повний знімок (MSG_KEYFRAME_REQUEST без тіла).
+# Повний знімок сам себе не перевіряє, тож після нього сума не надсилається
+CHECKSUM = struct.Struct("!II")
+CHECKSUM_FIELDS = struct.Struct("!I" + FIELD_FORMATS[:EVENTS_FIELD])
+
+# Введення (і по TCP, і по UDP): порядковий номер, останній отриманий клієнтом
+# тік і маска утримуваних клавіш (KEY_UP | KEY_DOWN). Кадри зі старим номером відкидаються.
+# Клієнт повторює кадр і без змін (клієнт гри - раз на 100 мс): за тіком з нього сервер
+# міряє відставання, і гравця, що мовчить або відстає довше за LAG_BUDGET, відключає
+INPUT = struct.Struct("!IIB")
+
+# Підтвердження введення для передбачення на клієнті: номер кадру INPUT і
+# положення платформи гравця в момент, коли сервер цей кадр застосував
+INPUT_ACK = struct.Struct("!If")
+
+# Формати введення: кадри INPUT або застарілі рядки "UP"/"DOWN" без розділювачів
+INPUT_FRAMED = "framed"
+INPUT_LEGACY = "legacy"
+
+# Клієнт старого формату спершу чекає свій id рядком "0\n" і лише потім надсилає
+# player_info. Якщо рукостискання не прийшло вчасно, сервер (або супервізор від
+# імені гравця) підставляє цей порожній рядок і веде з'єднання за старими правилами
+LEGACY_HANDSHAKE = b"\n"
+
+# Режим підключення з player_info: гравець або глядач (лише отримує знімки)
+MODE_PLAY = "play"
+MODE_SPECTATE = "spectate"
+
+# Як часто надсилати повний знімок замість дельти (у тіках)
+KEYFRAME_INTERVAL = 60
+# Як часто перевіряти відновлений з дельт стан контрольною сумою: розбіжність
+# виявляється за чверть секунди, а не лише з наступним повним знімком
+CHECKSUM_INTERVAL = KEYFRAME_INTERVAL // 4
+
+# Прапорці подій; якщо за тік сталося кілька, звук обирається за пріоритетом
+EVENT_FLAGS = {
+    "wall_hit": 1,
+    "platform_hit": 2,
+    "score": 4,
+}
+EVENT_PRIORITY = ["score", "platform_hit", "wall_hit"]
+
+
+def pick_sound_event(events) -> Optional[str]:
+    """Якщо за тік сталося кілька подій, звук обирається за пріоритетом"""
+    return next((name for name in EVENT_PRIORITY if name in events), None)
+
+
+def choose_protocol(requested) -> str:
+    """Обрати формат зі списку, який надіслав клієнт; без списку - JSON"""
+    if isinstance(requested, list):
+        for name in SUPPORTED_PROTOCOLS:
+            if name in requested:
+                return name
+    return PROTOCOL_JSON
+
+
+def encode_event_flags(sound_event: Optional[str]) -> int:
+    return EVENT_FLAGS.get(sound_event, 0) if sound_event else 0
+
+
+def decode_event_flags(flags: int) -> Optional[str]:
+    for name in EVENT_PRIORITY:
+        if flags & EVENT_FLAGS[name]:
+            return name
+    return None
+
+
+def encode_frame(msg_type: int, payload: bytes) -> bytes:
+    return FRAME_HEADER.pack(msg_type, len(payload)) + payload
+
+
+def encode_udp_hello(token: bytes) -> bytes:
+    """Перший UDP-пакет клієнта: токен, отриманий у привітанні по TCP"""
+    return encode_frame(MSG_UDP_HELLO, token)
+
+
+def encode_keyframe_request() -> bytes:
+    return encode_frame(MSG_KEYFRAME_REQUEST, b"")
+
+
+def encode_input(seq: int, tick: int, keys: int) -> bytes:
+    return encode_frame(MSG_INPUT, INPUT.pack(seq, tick, keys))
+
+
+def encode_input_ack(seq: int, paddle_y: float) -> bytes:
+    return encode_frame(MSG_INPUT_ACK, INPUT_ACK.pack(seq, paddle_y))
+
+
+def decode_datagram(data: bytes) -> Optional[Tuple[int, bytes]]:
+    """Датаграма містить рівно один кадр; пошкоджені повертають None"""
+    if len(data) < FRAME_HEADER.size:
+        return None
+    msg_type, length = FRAME_HEADER.unpack_from(data)
+    if len(data) != FRAME_HEADER.size + length:
+        return None
+    return msg_type, data[FRAME_HEADER.size:]
+
+
+def snapshot_values(state: dict) -> tuple:
+    """Стан матчу у вигляді кортежу полів у порядку FIELD_FORMATS"""
+    ball = state["ball"]
+    winner = state["winner"]
+    return (
+        int(state["paddles"][0]), int(state["paddles"][1]),
+        ball["x"], ball["y"], ball["vx"], ball["vy"],
+        state["scores"][0], state["scores"][1],
+        state["countdown"],
+        -1 if winner is None else winner,
+        encode_event_flags(state.get("sound_event")),
+    )
+
+
+def values_to_state(tick: int, values) -> dict:
+    """Кортеж полів у той самий словник, що дає JSON-формат"""
+    (paddle0, paddle1, x, y, vx, vy,
+     score0, score1, countdown, winner, flags) = values
+    return {
+        "tick": tick,
+        "paddles": {"0": paddle0, "1": paddle1},
+        "ball": {"x": x, "y": y, "vx": vx, "vy": vy},
+        "scores": [score0, score1],
+        "countdown": countdown,
+        "winner": None if winner < 0 else winner,
+        "sound_event": decode_event_flags(flags),
+    }
+
+
+def state_checksum(tick: int, values) -> int:
+    return zlib.crc32(CHECKSUM_FIELDS.pack(tick, *values[:EVENTS_FIELD]))
+
+
+def encode_snapshot(tick: int, values: tuple) -> bytes:
+    """Запакувати повний знімок у бінарний кадр"""
+    return encode_frame(MSG_SNAPSHOT, SNAPSHOT.pack(tick, *values))
+
+
+def encode_delta(tick: int, values: tuple, baseline_tick: int, baseline: tuple) -> bytes:
+    """Запакувати лише поля, що змінились відносно базового знімка"""
+    mask = 0
+    parts = []
+    for i, value in enumerate(values):
+        changed = value != 0 if i == EVENTS_FIELD else value != baseline[i]
+        if changed:
+            mask |= 1 << i
+            parts.append(FIELD_STRUCTS[i].pack(value))
+    payload = DELTA_HEADER.pack(tick, baseline_tick, mask) + b"".join(parts)
+    return encode_frame(MSG_DELTA, payload)
+
+
+class SnapshotFrames:
+    """Усі кадри одного тіку матчу.
+
+    Кожен варіант (JSON, повний знімок, дельта від певної бази) кодується
+    лише при першому запиті, а далі той самий незмінний bytes-об'єкт
+    роздається всім підписникам без копіювання.
+    """
+
+    def __init__(self, tick: int, state: dict):
+        self.tick = tick
+        self.state = state
+        self.values = snapshot_values(state)
+        self.keyframe = tick % KEYFRAME_INTERVAL == 0
+        self._json = None
+        self._full = None
+        self._checksum = None
+        self._deltas = {}
+
+    def json(self) -> bytes:
+        if self._json is None:
+            self._json = encode_json(self.state)
+        return self._json
+
+    def full(self) -> bytes:
+        if self._full is None:
+            self._full = encode_snapshot(self.tick, self.values)
+        return self._full
+
+    def checksum(self) -> bytes:
+        if self._checksum is None:
+            self._checksum = encode_frame(MSG_CHECKSUM, CHECKSUM.pack(self.tick, state_checksum(self.tick, self.values)))
+        return self._checksum
+
+    def delta(self, baseline_tick: int, baseline: tuple) -> bytes:
+        # У межах матчу однаковий тік бази означає однакові поля бази
+        frame = self._deltas.get(baseline_tick)
+        if frame is None:
+            frame = self._deltas[baseline_tick] = encode_delta(self.tick, self.values, baseline_tick, baseline)
+        return frame
+
+
+class SnapshotDecoder:
+    """Відновлює стан гри з повних знімків і дельт на боці клієнта"""
+
+    def __init__(self):
+        self.tick = None
+        self.values = None
+        # Контрольна сума не збіглась: треба попросити в сервера повний знімок
+        self.desynced = False
+        self.mismatches = 0
+
+    def apply(self, msg_type: int, payload: bytes) -> Optional[dict]:
+        """Повернути новий стан або None, якщо кадр не вдалося застосувати"""
+        if msg_type == MSG_CHECKSUM:
+            tick, checksum = CHECKSUM.unpack(payload)
+            if tick == self.tick and self.values is not None and checksum != state_checksum(tick, self.values):
+                # Відновлений з дельт стан розійшовся із серверним - дельти до
+                # наступного повного знімка застосовувати нема до чого
+                self.values = None
+                self.desynced = True
+                self.mismatches += 1
+            return None
+        if msg_type == MSG_SNAPSHOT:
+            tick, *values = SNAPSHOT.unpack(payload)
+            if self.tick is not None and tick <= self.tick:
+                # Застарілий або продубльований UDP-пакет
+                return None
+            self.tick, self.values = tick, values
+        elif msg_type == MSG_DELTA:
+            tick, baseline_tick, mask = DELTA_HEADER.unpack_from(payload)
+            if self.values is None or baseline_tick != self.tick:
+                # Немає потрібної бази - чекаємо наступний повний знімок
+                return None
+            values = list(self.values)
+            values[EVENTS_FIELD] = 0
+            offset = DELTA_HEADER.size
+            for i, field in enumerate(FIELD_STRUCTS):
+                if mask & (1 << i):
+                    values[i], = field.unpack_from(payload, offset)
+                    offset += field.size
+            self.tick, self.values = tick, values
+        else:
+            return None
+        return values_to_state(self.tick, self.values)
+
+
+def encode_json(state: dict) -> bytes:
+    """Запасний формат: один JSON-об'єкт на рядок"""
+    return (json.dumps(state) + "\n").encode()
+
+
+class LegacyInputDecoder:
+    """Розбирає старий формат введення, де команди йдуть підряд без розділювачів.
+
+    TCP може склеїти кілька команд ("UPUPDOWN") або розірвати одну посередині,
+    тому незавершений хвіст (до 3 байтів) зберігається до наступного читання.
+    Решта байтів поза командами лише рахується в junk - за ним сервер відрізняє
+    старий клієнт від сміття.
+    """
+
+    COMMAND_PATTERN = re.compile(rb"UP|DOWN")
+    PARTIAL_COMMANDS = (b"U", b"D", b"DO", b"DOW")
+
+    def __init__(self):
+        self.buffer = b""
+        self.junk = 0
+
+    def feed(self, data: bytes) -> List[str]:
+        # Один прохід по даних: буфер між читаннями не довший за 3 байти
+        data = self.buffer + data
+        commands = []
+        end = 0
+        for match in self.COMMAND_PATTERN.finditer(data):
+            self.junk += match.start() - end
+            commands.append(match.group().decode())
+            end = match.end()
+        tail = data[end:]
+        keep = 0
+        for size in (3, 2, 1):
+            if tail[-size:] in self.PARTIAL_COMMANDS:
+                keep = len(tail[-size:])
+                break
+        self.junk += len(tail) - keep
+        self.buffer = tail[len(tail) - keep:]
+        return commands
+
+
+class FrameDecoder:
+    """Розбирає потік байтів на кадри незалежно від того, як TCP їх поділив"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data: bytes) -> List[Tuple[int, bytes]]:
+        self.buffer.extend(data)
+        frames = []
+        offset = 0
+        while len(self.buffer) - offset >= FRAME_HEADER.size:
+            msg_type, length = FRAME_HEADER.unpack_from(self.buffer, offset)
+            end = offset + FRAME_HEADER.size + length
+            if len(self.buffer) < end:
+                break
+            frames.append((msg_type, bytes(self.buffer[offset + FRAME_HEADER.size:end])))
+            offset = end
+        del self.buffer[:offset]
+        return frames
@@ -0,0 +1,294 @@
+"""
+Реплеї матчів Пінг-Понгу
+Сервер записує кожен матч у компактний журнал, який лише дописується:
+зерно генератора випадкових чисел, зміни введення по тіках, команди старого
+формату, здачу матчу, події, періодичні контрольні суми стану та підсумок.
+Симуляція детермінована, тож з журналу матч відтворюється до біта - без
+запису самих станів.
+
+    python replay.py replays/файл.replay               # перевірка на максимальній швидкості
+    python replay.py replays/файл.replay --serve -s 4  # показ клієнту у 4 рази швидше
+"""
+
+import asyncio
+import argparse
+import json
+import os
+import random
+import struct
+import time
+
+from protocol import (
+    PROTOCOL_BINARY, SnapshotFrames, choose_protocol, pick_sound_event, snapshot_values, state_checksum,
+)
+from simulation import EVENT_BITS, PongSimulation
+
+REPLAY_MAGIC = b"PPRL"
+REPLAY_VERSION = 1
+PLAYBACK_SPEEDS = (1, 4, 16)
+
+# Заголовок: сигнатура, версія, частота кроків, зерно, довжина JSON з описом матчу
+REPLAY_HEADER = struct.Struct("!4sBHIH")
+
+# Кожен запис: тип і тік, після якого (до наступного кроку) він застосовується
+RECORD = struct.Struct("!BI")
+REC_INPUT = 1     # маски клавіш обох гравців
+REC_NUDGE = 2     # команда старого формату: гравець, 0 - "UP", 1 - "DOWN"
+REC_FORFEIT = 3   # гравець покинув матч
+REC_EVENTS = 4    # прапорці подій кроку (для пошуку розбіжностей)
+REC_END = 5       # рахунок і переможець (-1 - немає)
+REC_CHECKSUM = 6  # контрольна сума стану після кроку (раз на KEYFRAME_INTERVAL тіків)
+RECORD_PAYLOADS = {
+    REC_INPUT: struct.Struct("!BB"),
+    REC_NUDGE: struct.Struct("!BB"),
+    REC_FORFEIT: struct.Struct("!B"),
+    REC_EVENTS: struct.Struct("!B"),
+    REC_END: struct.Struct("!BBb"),
+    REC_CHECKSUM: struct.Struct("!I"),
+}
+NUDGE_COMMANDS = ("UP", "DOWN")
+EVENT_MASKS = {name: bit for bit, name in EVENT_BITS}
+
+
+def encode_events(events) -> int:
+    flags = 0
+    for name in events:
+        flags |= EVENT_MASKS[name]
+    return flags
+
+
+class ReplayRecorder:
+    """Дописує записи одного матчу у файл. Заголовок і кожна контрольна сума одразу
+    скидаються на диск, тож після падіння сервера лишається журнал до останньої з них"""
+
+    def __init__(self, path: str, seed: int, tick_rate: int, meta: dict):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.file = open(path, "ab")
+        meta_bytes = json.dumps(meta).encode()
+        self.file.write(REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, tick_rate, seed, len(meta_bytes)))
+        self.file.write(meta_bytes)
+        self.file.flush()
+        self.keys = (0, 0)
+
+    def write(self, rec_type: int, tick: int, *values):
+        self.file.write(RECORD.pack(rec_type, tick) + RECORD_PAYLOADS[rec_type].pack(*values))
+
+    def inputs(self, tick: int, keys: dict):
+        # Записуємо лише зміни: утримувані клавіші змінюються рідко
+        keys = (keys[0], keys[1])
+        if keys != self.keys:
+            self.keys = keys
+            self.write(REC_INPUT, tick, *keys)
+
+    def nudge(self, tick: int, pid: int, command: str):
+        if command in NUDGE_COMMANDS:
+            self.write(REC_NUDGE, tick, pid, NUDGE_COMMANDS.index(command))
+
+    def forfeit(self, tick: int, pid: int):
+        self.write(REC_FORFEIT, tick, pid)
+        self.file.flush()
+
+    def events(self, tick: int, events):
+        if events:
+            self.write(REC_EVENTS, tick, encode_events(events))
+
+    def checksum(self, tick: int, checksum: int):
+        self.write(REC_CHECKSUM, tick, checksum)
+        # Раз на KEYFRAME_INTERVAL тіків - записи до цієї точки переживуть падіння процесу
+        self.file.flush()
+
+    def finish(self, tick: int, scores, winner):
+        self.write(REC_END, tick, scores[0], scores[1], -1 if winner is None else winner)
+        self.close()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+def read_replay(path: str):
+    """Прочитати журнал: (заголовок, список записів (тип, тік, значення))"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < REPLAY_HEADER.size:
+        raise ValueError(f"{path}: файл обірваний або порожній ({len(data)} байт)")
+    magic, version, tick_rate, seed, meta_size = REPLAY_HEADER.unpack_from(data)
+    if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+        raise ValueError(f"{path}: не файл реплею або непідтримувана версія")
+    offset = REPLAY_HEADER.size
+    if offset + meta_size > len(data):
+        raise ValueError(f"{path}: обірваний опис матчу")
+    header = {
+        "tick_rate": tick_rate,
+        "seed": seed,
+        "meta": json.loads(data[offset:offset + meta_size]),
+    }
+    offset += meta_size
+    records = []
+    # Обірваний останній запис (сервер упав) просто ігнорується
+    while offset + RECORD.size <= len(data):
+        rec_type, tick = RECORD.unpack_from(data, offset)
+        payload = RECORD_PAYLOADS.get(rec_type)
+        if payload is None or offset + RECORD.size + payload.size > len(data):
+            break
+        records.append((rec_type, tick, payload.unpack_from(data, offset + RECORD.size)))
+        offset += RECORD.size + payload.size
+    return header, records
+
+
+def resimulate(header: dict, records):
+    """Генератор (стан, події, записані прапорці, записана контрольна сума або None)
+    для кожного кроку матчу"""
+    sim = PongSimulation(random.Random(header["seed"]))
+    dt = 1.0 / header["tick_rate"]
+    keys = {0: 0, 1: 0}
+    recorded_events = {}
+    checksums = {}
+    actions = []
+    end_tick = None
+    for rec_type, tick, values in records:
+        if rec_type == REC_EVENTS:
+            recorded_events[tick] = values[0]
+        elif rec_type == REC_CHECKSUM:
+            checksums[tick] = values[0]
+        elif rec_type == REC_END:
+            end_tick = tick
+        else:
+            actions.append((rec_type, tick, values))
+    if end_tick is None:
+        end_tick = max([tick for _, tick, _ in records], default=0)
+
+    index = 0
+    while sim.tick < end_tick:
+        # Усе, що сталося між кроками, застосовується в порядку запису
+        while index < len(actions) and actions[index][1] <= sim.tick:
+            rec_type, _, values = actions[index]
+            if rec_type == REC_INPUT:
+                keys = {0: values[0], 1: values[1]}
+            elif rec_type == REC_NUDGE:
+                sim.nudge_paddle(values[0], NUDGE_COMMANDS[values[1]])
+            elif rec_type == REC_FORFEIT:
+                sim.forfeit(values[0])
+            index += 1
+        state, events = sim.step(keys, dt)
+        yield state, events, recorded_events.get(sim.tick, 0), checksums.get(sim.tick)
+
+
+def verify(path: str):
+    """Відтворити матч без мережі на максимальній швидкості і знайти розбіжності"""
+    header, records = read_replay(path)
+    end = next((values for rec_type, _, values in records if rec_type == REC_END), None)
+    started = time.perf_counter()
+    ticks = 0
+    first_desync = None
+    state = None
+    for state, events, recorded, checksum in resimulate(header, records):
+        ticks += 1
+        if first_desync is not None:
+            continue
+        if encode_events(events) != recorded:
+            first_desync = state["tick"]
+        elif checksum is not None and checksum != state_checksum(state["tick"], snapshot_values(state)):
+            first_desync = state["tick"]
+    elapsed = time.perf_counter() - started
+    print(f"📼 {path}: {header['meta']}")
+    print(f"⏱  {ticks} кроків за {elapsed:.3f} с ({ticks / elapsed if elapsed else 0:,.0f} кроків/с)")
+    if state is not None:
+        print(f"Рахунок: {state['scores']}, переможець: {state['winner']}")
+    if end is not None and state is not None:
+        winner = None if end[2] < 0 else end[2]
+        if [end[0], end[1]] != state["scores"] or winner != state["winner"]:
+            first_desync = first_desync or state["tick"]
+    if first_desync is None:
+        print("✓ Відтворення збігається із записом")
+    else:
+        print(f"❌ Розбіжність із записом з тіку {first_desync}")
+    return first_desync is None
+
+
+class ReplayStreamProtocol(asyncio.Protocol):
+    """Показ реплею звичайному клієнту: привітання як гравцю 0 і знімки з обраною швидкістю.
+    Введення клієнта ігнорується"""
+
+    def __init__(self, header, records, speed):
+        self.header = header
+        self.records = records
+        self.speed = speed
+        self.transport = None
+        self.handshake = b""
+        self.task = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        if self.task is not None:
+            return
+        self.handshake += data
+        if b"\n" not in self.handshake:
+            return
+        line = self.handshake.split(b"\n", 1)[0]
+        try:
+            player_info = json.loads(line)
+        except ValueError:
+            player_info = {}
+        if not isinstance(player_info, dict):
+            player_info = {}
+        protocol = choose_protocol(player_info.get("protocols"))
+        # Без "acks": введення ігнорується, тож клієнт не передбачає платформу 0,
+        # а показує її такою, як у записі
+        welcome = {"id": 0, "protocol": protocol, "tick_rate": self.header["tick_rate"]}
+        self.transport.write((json.dumps(welcome) + "\n").encode())
+        self.task = asyncio.get_running_loop().create_task(self.stream(protocol))
+
+    async def stream(self, protocol):
+        interval = 1.0 / (self.header["tick_rate"] * self.speed)
+        baseline = None
+        next_time = time.monotonic()
+        for state, events, _, _ in resimulate(self.header, self.records):
+            if self.transport.is_closing():
+                return
+            state["sound_event"] = pick_sound_event(events)
+            frames = SnapshotFrames(state["tick"], state)
+            if protocol != PROTOCOL_BINARY:
+                self.transport.write(frames.json())
+            elif frames.keyframe or baseline is None:
+                self.transport.write(frames.full())
+            else:
+                self.transport.write(frames.delta(*baseline))
+            baseline = (frames.tick, frames.values)
+            next_time += interval
+            await asyncio.sleep(max(0.0, next_time - time.monotonic()))
+        self.transport.close()
+
+    def connection_lost(self, exc):
+        if self.task is not None:
+            self.task.cancel()
+
+
+async def serve(path: str, host: str, port: int, speed: int):
+    header, records = read_replay(path)
+    loop = asyncio.get_running_loop()
+    server = await loop.create_server(lambda: ReplayStreamProtocol(header, records, speed), host, port,
+                                      reuse_address=True)
+    print(f"📼 Показ реплею {path} у {speed}x на {host}:{port}. Підключіть клієнт.")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Перевірка та показ реплеїв Пінг-Понгу")
+    parser.add_argument("path", help="файл реплею")
+    parser.add_argument("--serve", action="store_true", help="показувати реплей клієнтам замість перевірки")
+    parser.add_argument("-s", "--speed", type=int, default=1, choices=PLAYBACK_SPEEDS)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+    try:
+        if args.serve:
+            asyncio.run(serve(args.path, args.host, args.port, args.speed))
+        else:
+            raise SystemExit(0 if verify(args.path) else 1)
+    except (OSError, ValueError) as error:
+        raise SystemExit(f"❌ {error}")
@@ -1,151 +1,713 @@
-import socket
+import asyncio
+import argparse
 import json
-import threading
-import time
+import itertools
+import os
 import random
+import secrets
+import socket
+import time
 
-WIDTH, HEIGHT = 800, 600
-BALL_SPEED = 5
-PADDLE_SPEED = 10
-COUNTDOWN_START = 3
+from protocol import (
+    CHECKSUM_INTERVAL, INPUT, INPUT_FRAMED, KEYFRAME_INTERVAL, LEGACY_HANDSHAKE, MODE_SPECTATE, MSG_INPUT,
+    MSG_KEYFRAME_REQUEST, MSG_UDP_HELLO, PROTOCOL_BINARY, PROTOCOL_JSON, TRANSPORT_UDP, FrameDecoder,
+    LegacyInputDecoder, SnapshotFrames, choose_protocol,
+    decode_datagram, encode_input_ack, pick_sound_event, snapshot_values, state_checksum,
+)
+from simulation import EVENT_COUNTDOWN, BatchSimulation, PongSimulation
+from lobby import PAIRING_FIFO, Lobby, parse_pairing
+from replay import ReplayRecorder
 
-class GameServer:
-    def __init__(self, host='localhost', port=8080):
-        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server.bind((host, port))
-        self.server.listen(2)
-        print("🎮 Server started")
+TICK_RATE = 60  # кроків симуляції за секунду
+LISTEN_BACKLOG = 128
+RESTART_DELAY = 5
+MAX_HANDSHAKE_SIZE = 4096  # байтів на рядок з інформацією про гравця
+MAX_LEGACY_JUNK = 1024  # байтів поза командами UP/DOWN, після яких старе з'єднання закривається
+LEGACY_HANDSHAKE_TIMEOUT = 1.0  # секунд тиші, після яких клієнт вважається старим (чекає id першим)
+WRITE_BUFFER_HIGH = 16 * 1024  # байтів у черзі сокета, після яких знімки не пишемо
+WRITE_BUFFER_LOW = 4 * 1024
+# Буфер відправки ядра. Типовий Linux дає до 4 МБ, і клієнт, що не читає,
+# годинами не доводить справу до pause_writing - тому обмежуємо його
+SEND_BUFFER_SIZE = WRITE_BUFFER_HIGH
+LAG_BUDGET = 3.0  # секунд без можливості писати (або відставання за тіком), після яких клієнта відключаємо
+MAX_CATCHUP_STEPS = 5  # скільки пропущених кроків можна наздогнати за раз
+STATS_INTERVAL = 10  # секунд між виводом метрик планувальника
+SPECTATOR_RATE_DIVISOR = 3  # глядачі отримують кожен N-й знімок (і всі знімки з подіями)
+MAX_SPECTATORS = 500  # глядачів на один матч
+
+
+class TickScheduler:
+    """Планувальник симуляції з фіксованим кроком.
+
+    Накопичує реальний час за монотонним годинником і викликає step(dt)
+    стільки разів, скільки фіксованих кроків минуло, тому швидкість гри не
+    залежить від навантаження. Відставання понад max_catchup кроків
+    відкидається, щоб сервер не пішов у "спіраль смерті".
+    """
+
+    def __init__(self, tick_rate: int = TICK_RATE, max_catchup: int = MAX_CATCHUP_STEPS):
+        self.tick_rate = tick_rate
+        self.dt = 1.0 / tick_rate
+        self.max_catchup = max_catchup
+        self.tick = 0
+        self._started = None
+        self.metrics = {
+            "ticks": 0,
+            "overruns": 0,        # кроки, що виконувались довше за dt
+            "catchup_steps": 0,   # додаткові кроки для наздоганяння
+            "dropped_ticks": 0,   # кроки, відкинуті через обмеження наздоганяння
+            "max_step_time": 0.0,
+            "max_lateness": 0.0,
+        }
+
+    def stats(self) -> dict:
+        """Знімок метрик разом із середньою частотою кроків"""
+        stats = dict(self.metrics)
+        elapsed = time.monotonic() - self._started if self._started else 0.0
+        stats["tick_rate"] = self.tick_rate
+        stats["actual_rate"] = round(self.tick / elapsed, 2) if elapsed > 0 else 0.0
+        return stats
+
+    async def run(self, step):
+        clock = time.monotonic
+        self._started = previous = clock()
+        accumulator = 0.0
+        while True:
+            now = clock()
+            accumulator += now - previous
+            previous = now
+            if accumulator > self.dt:
+                self.metrics["max_lateness"] = max(self.metrics["max_lateness"], accumulator - self.dt)
+
+            steps = 0
+            while accumulator >= self.dt and steps < self.max_catchup:
+                started = clock()
+                step(self.dt)
+                elapsed = clock() - started
+                if elapsed > self.dt:
+                    self.metrics["overruns"] += 1
+                self.metrics["max_step_time"] = max(self.metrics["max_step_time"], elapsed)
+                self.tick += 1
+                self.metrics["ticks"] += 1
+                accumulator -= self.dt
+                steps += 1
+            if steps > 1:
+                self.metrics["catchup_steps"] += steps - 1
+
+            if accumulator >= self.dt:
+                dropped = int(accumulator / self.dt)
+                self.metrics["dropped_ticks"] += dropped
+                accumulator -= dropped * self.dt
+
+            await asyncio.sleep(max(0.0, self.dt - accumulator))
+
+
+class ClientProtocol(asyncio.Protocol):
+    """З'єднання одного гравця: неблокуюче читання і запис у циклі подій.
+
+    Черга на відправку обмежена: коли буфер сокета переповнений, знімки не
+    накопичуються, а зберігається лише найновіший, який буде надіслано після
+    звільнення буфера. Клієнт, що не читає довше за LAG_BUDGET, відключається.
+    Знімки осідають і в буфері прийому клієнта, тому відставання міряється ще й
+    за тіком, який клієнт повертає у кадрах введення.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.match = None
+        self.pid = None
+        self.player_info = None
+        self.protocol = PROTOCOL_JSON
+        self.handshake = b""
+        # Останній надісланий знімок (тік, поля) - база для дельт. TCP доставляє
+        # кадри по порядку, тож надісланий кадр клієнт застосує саме на цю базу
+        self.baseline = None
+        self.paused_since = None
+        self.pending = None
+        # UDP-режим: токен з привітання, адреса після UDP_HELLO, останній номер введення
+        self.udp_token = None
+        self.udp_addr = None
+        # Введення: кадри INPUT з номерами або старі рядки "UP"/"DOWN"
+        self.input_decoder = None
+        self.input_seq = -1
+        self.input_tick = 0
+        # Глядач лише отримує знімки: введення від нього ігнорується
+        self.spectator = False
+        # Клієнт перевіряє контрольні суми станів і може попросити повний знімок
+        self.checksums = False
+        # Клієнт старого формату: id простим рядком, далі його рядок player_info
+        self.legacy = False
+        self.awaiting_info = False
+        self.legacy_timer = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        transport.set_write_buffer_limits(high=WRITE_BUFFER_HIGH, low=WRITE_BUFFER_LOW)
+        sock = transport.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER_SIZE)
+        self.legacy_timer = asyncio.get_running_loop().call_later(LEGACY_HANDSHAKE_TIMEOUT, self.legacy_timeout)
 
+    def legacy_timeout(self):
+        """Клієнт мовчить - це старий клієнт, що чекає свій id"""
+        self.legacy_timer = None
+        if self.player_info is None and not self.handshake:
+            self.data_received(LEGACY_HANDSHAKE)
+
+    def pause_writing(self):
+        self.paused_since = time.monotonic()
+
+    def resume_writing(self):
+        self.paused_since = None
+        if self.pending is not None:
+            frames, self.pending = self.pending, None
+            self.send_snapshot(frames)
+
+    def data_received(self, data):
+        if self.player_info is None:
+            # Перший рядок - JSON з інформацією про гравця та форматами
+            line, data = self.read_line(data)
+            if line is None:
+                return
+            if self.legacy_timer is not None:
+                self.legacy_timer.cancel()
+                self.legacy_timer = None
+            if not line.strip():
+                # Старий клієнт: спершу отримає id, потім надішле свій player_info
+                self.legacy = self.awaiting_info = True
+                self.player_info = {}
+                self.input_decoder = LegacyInputDecoder()
+                self.server.seat_player(self)
+                if not data:
+                    return
+            else:
+                self.player_info = self.parse_info(line)
+                self.protocol = choose_protocol(self.player_info.get("protocols"))
+                self.checksums = self.player_info.get("checksum") is True
+                if self.player_info.get("mode") == MODE_SPECTATE:
+                    # Глядач не керує платформою, але після розбіжності контрольної
+                    # суми може попросити повний знімок (MSG_KEYFRAME_REQUEST)
+                    self.spectator = True
+                    self.input_decoder = FrameDecoder()
+                    self.server.add_spectator(self)
+                else:
+                    if self.player_info.get("input") == INPUT_FRAMED:
+                        self.input_decoder = FrameDecoder()
+                    else:
+                        self.input_decoder = LegacyInputDecoder()
+                    self.server.seat_player(self)
+                if not data:
+                    return
+        if self.awaiting_info:
+            # Рядок player_info старого клієнта - лише ім'я та скіни, формати не змінюються
+            line, data = self.read_line(data)
+            if line is None:
+                return
+            self.awaiting_info = False
+            self.player_info.update(self.parse_info(line))
+            if not data:
+                return
+        if not self.match:
+            return
+        if isinstance(self.input_decoder, LegacyInputDecoder):
+            for command in self.input_decoder.feed(data):
+                self.match.nudge_paddle(self.pid, command)
+            if self.input_decoder.junk > MAX_LEGACY_JUNK:
+                # Старий клієнт надсилає лише команди - це не він
+                self.close()
+            return
+        for msg_type, payload in self.input_decoder.feed(data):
+            if msg_type == MSG_INPUT and not self.spectator:
+                self.handle_input_frame(payload)
+            elif msg_type == MSG_KEYFRAME_REQUEST:
+                self.baseline = None  # наступний знімок піде повним
+
+    def read_line(self, data):
+        """Дочитати рядок рукостискання: (рядок, решта даних) або (None, b"")"""
+        self.handshake += data
+        if b"\n" not in self.handshake:
+            if len(self.handshake) > MAX_HANDSHAKE_SIZE:
+                self.close()
+            return None, b""
+        line, rest = self.handshake.split(b"\n", 1)
+        self.handshake = b""
+        return line, rest
+
+    @staticmethod
+    def parse_info(line) -> dict:
+        try:
+            info = json.loads(line)
+        except ValueError:
+            return {}
+        return info if isinstance(info, dict) else {}
+
+    def handle_input_frame(self, payload):
+        """Застосувати кадр введення, якщо він новіший за попередній"""
+        if len(payload) != INPUT.size or not self.match:
+            return
+        seq, tick, keys = INPUT.unpack(payload)
+        if seq <= self.input_seq:
+            return
+        self.input_seq = seq
+        self.input_tick = tick
+        self.match.set_keys(self.pid, keys)
+        if self.match.simulation is not None and self.protocol == PROTOCOL_BINARY:
+            # Клієнт звіряє з цим положенням своє передбачення платформи
+            ack = encode_input_ack(seq, self.match.simulation.paddle(self.pid))
+            if self.udp_addr is not None:
+                self.server.udp_transport.sendto(ack, self.udp_addr)
+            else:
+                self.send(ack)
+
+    def connection_lost(self, exc):
+        if self.legacy_timer is not None:
+            self.legacy_timer.cancel()
+        self.server.forget_udp(self)
+        if self.spectator:
+            if self.match:
+                self.match.remove_spectator(self)
+            return
+        if self.match:
+            self.match.player_left(self.pid, self)
+            if not self.match.started:
+                self.server.unseat(self.match)
+
+    def send(self, data):
+        if not self.transport.is_closing():
+            self.transport.write(data)
+
+    def send_welcome(self, pid):
+        """Привітання по TCP: id гравця, формат знімків, чи будуть підтвердження
+        введення і, за бажанням, UDP-канал. Глядач замість id отримує номер матчу,
+        а старий клієнт - лише id рядком"""
+        if self.legacy:
+            self.send(f"{pid}\n".encode())
+            return
+        welcome = {"id": pid, "protocol": self.protocol, "tick_rate": self.server.scheduler.tick_rate}
+        transports = self.player_info.get("transports")
+        if self.spectator:
+            welcome["match"] = self.match.match_id
+            welcome["mode"] = MODE_SPECTATE
+        elif self.protocol == PROTOCOL_BINARY:
+            # MSG_INPUT_ACK надсилається лише на кадри INPUT; без них клієнт не
+            # може звіряти передбачення і показує свою платформу зі знімків
+            welcome["acks"] = isinstance(self.input_decoder, FrameDecoder)
+            if isinstance(transports, list) and TRANSPORT_UDP in transports:
+                token = self.server.register_udp(self)
+                if token is not None:
+                    welcome["udp_port"] = self.server.udp_port
+                    welcome["udp_token"] = token.hex()
+        self.send((json.dumps(welcome) + "\n").encode())
+
+    def send_snapshot(self, frames, reliable=False):
+        """Надіслати кадр тіку у форматі цього клієнта.
+
+        reliable=True для підсумкових знімків (кінець гри): UDP-клієнт тоді
+        отримує їх і по TCP, бо датаграма може загубитись.
+        """
+        if self.transport.is_closing():
+            return
+        if self.echo_lag() > LAG_BUDGET:
+            self.drop_lagging()
+            return
+        if self.udp_addr is not None:
+            # По UDP лише повні знімки: без підтверджень немає надійної бази для дельт
+            self.server.udp_transport.sendto(frames.full(), self.udp_addr)
+            if not reliable:
+                return
+        if self.paused_since is not None:
+            # Повільний клієнт: старий знімок замінюється новим, дельта
+            # рахуватиметься від останнього справді надісланого кадру
+            if self.pending is not None:
+                self.server.metrics["dropped_snapshots"] += 1
+            self.pending = frames
+            if time.monotonic() - self.paused_since > LAG_BUDGET:
+                self.drop_lagging()
+            return
+        if self.protocol != PROTOCOL_BINARY:
+            self.send(frames.json())
+            return
+        if frames.keyframe or self.baseline is None:
+            self.send(frames.full())
+        else:
+            self.send(frames.delta(*self.baseline))
+            if self.checksums and frames.tick % CHECKSUM_INTERVAL == 0:
+                self.send(frames.checksum())
+        self.baseline = (frames.tick, frames.values)
+
+    def echo_lag(self) -> float:
+        """На скільки секунд тік, повернутий клієнтом у кадрах введення, відстає від матчу.
+        Клієнт з кадрами INPUT повторює стан клавіш щонайменше раз на 100 мс, тож
+        мовчання теж рахується як відставання; глядачі й старий формат введення не перевіряються"""
+        if (self.spectator or not isinstance(self.input_decoder, FrameDecoder)
+                or self.match is None or self.match.simulation is None):
+            return 0.0
+        return (self.match.tick - self.input_tick) / self.server.scheduler.tick_rate
+
+    def drop_lagging(self):
+        self.server.metrics["lag_disconnects"] += 1
+        who = "Глядач" if self.spectator else f"Гравець {self.pid}"
+        print(f"[матч {self.match.match_id}] {who} не встигає читати - відключаємо")
+        self.transport.abort()
+
+    def close(self):
+        self.transport.close()
+
+
+class Match:
+    """Окремий матч: гравці, підписники і власна симуляція PongSimulation"""
+
+    def __init__(self, match_id):
+        self.match_id = match_id
         self.clients = {0: None, 1: None}
         self.connected = {0: False, 1: False}
-        self.lock = threading.Lock()
-        self.reset_game_state()
-        self.sound_event = None
-
-    def reset_game_state(self):
-        self.paddles = {0: 250, 1: 250}
-        self.scores = [0, 0]
-        self.ball = {
-            "x": WIDTH // 2,
-            "y": HEIGHT // 2,
-            "vx": BALL_SPEED * random.choice([-1, 1]),
-            "vy": BALL_SPEED * random.choice([-1, 1])
+        # Гравці, що отримують кожен знімок, і глядачі зі зниженою частотою
+        self.subscribers = []
+        self.spectators = set()
+        self.started = False
+        self.finished = False
+        self.finish_timer = None
+        self.keys = {0: 0, 1: 0}
+        # PongSimulation або BatchSlot; з'являється, коли матч стартує
+        self.simulation = None
+        # Запис реплею, якщо сервер їх зберігає
+        self.recorder = None
+
+    @property
+    def tick(self):
+        return self.simulation.tick
+
+    def start(self, simulation, recorder=None):
+        self.simulation = simulation
+        self.recorder = recorder
+        self.started = True
+
+    def player_names(self):
+        return [(self.clients[pid].player_info or {}).get("name") if self.clients[pid] else None for pid in [0, 1]]
+
+    def record_inputs(self):
+        """Записати клавіші, з якими буде зроблено наступний крок"""
+        if self.recorder is not None:
+            self.recorder.inputs(self.simulation.tick, self.keys)
+
+    def is_full(self):
+        return all(self.connected.values())
+
+    def add_player(self, client):
+        """Посадити гравця на вільне місце, повернути його id або None"""
+        for pid in [0, 1]:
+            if not self.connected[pid]:
+                break
+        else:
+            return None
+        self.clients[pid] = client
+        self.connected[pid] = True
+        self.subscribers.append(client)
+        client.match = self
+        client.pid = pid
+        client.send_welcome(pid)
+        print(f"[матч {self.match_id}] Гравець {pid} приєднався")
+        return pid
+
+    def set_keys(self, pid, keys):
+        """Запам'ятати утримувані клавіші; платформа рухається в update()"""
+        self.keys[pid] = keys
+
+    def nudge_paddle(self, pid, command):
+        """Команда старого формату: одноразовий зсув платформи"""
+        if self.simulation is not None:
+            self.simulation.nudge_paddle(pid, command)
+            if self.recorder is not None:
+                self.recorder.nudge(self.simulation.tick, pid, command)
+
+    def player_left(self, pid, client):
+        if self.clients[pid] is not client:
+            return
+        self.connected[pid] = False
+        self.subscribers.remove(client)
+        if not self.started:
+            # Гравець пішов ще до старту - звільняємо місце
+            self.clients[pid] = None
+            print(f"[матч {self.match_id}] Гравець {pid} вийшов до початку гри")
+            return
+        if not self.simulation.game_over:
+            self.simulation.forfeit(pid)  # інший гравець автоматично виграє
+            if self.recorder is not None:
+                self.recorder.forfeit(self.simulation.tick, pid)
+            print(f"[матч {self.match_id}] Гравець {pid} відключився. Переміг гравець {1 - pid}.")
+
+    def broadcast_state(self, state, events=(), reliable=False):
+        state["sound_event"] = pick_sound_event(events)
+        frames = SnapshotFrames(state["tick"], state)
+        for client in self.subscribers:
+            client.send_snapshot(frames, reliable)
+        # Кадри вже закодовані для гравців, тож глядач коштує лише запис у сокет;
+        # знімки з подіями (звуки, відлік, кінець гри) глядачі отримують завжди
+        if self.spectators and (reliable or events or state["tick"] % SPECTATOR_RATE_DIVISOR == 0):
+            for client in self.spectators:
+                client.send_snapshot(frames, reliable)
+
+    def add_spectator(self, client):
+        if len(self.spectators) >= MAX_SPECTATORS:
+            return False
+        self.spectators.add(client)
+        client.match = self
+        client.send_welcome(None)
+        print(f"[матч {self.match_id}] Глядач приєднався. Глядачів: {len(self.spectators)}")
+        return True
+
+    def remove_spectator(self, client):
+        self.spectators.discard(client)
+
+    def update(self, dt):
+        """Просунути матч на один фіксований крок: відлік, гра або завершення"""
+        sim = self.simulation
+        if sim.game_over:
+            state, _ = sim.step(self.keys, dt)
+            if self.finish_timer is None:
+                # Повідомити клієнтів про переможця (у т.ч. після відключення)
+                self.broadcast_state(state, reliable=True)
+                if self.recorder is not None:
+                    self.recorder.finish(state["tick"], state["scores"], sim.winner)
+                    self.recorder = None
+                print(f"[матч {self.match_id}] Гравець {sim.winner} переміг!")
+                self.finish_timer = RESTART_DELAY
+                return
+            self.finish_timer -= dt
+            if self.finish_timer <= 0:
+                self.close()
+            return
+
+        state, events = sim.step(self.keys, dt)
+        if self.recorder is not None:
+            self.recorder.events(state["tick"], events)
+            if state["tick"] % KEYFRAME_INTERVAL == 0:
+                self.recorder.checksum(state["tick"], state_checksum(state["tick"], snapshot_values(state)))
+        # Під час відліку знімки надсилаються лише при зміні числа
+        if sim.countdown > 0 and EVENT_COUNTDOWN not in events:
+            return
+        self.broadcast_state(state, events)
+
+    def close(self):
+        """Закрити з'єднання всіх підписників матчу"""
+        for client in self.subscribers:
+            client.close()
+        for client in self.spectators:
+            client.close()
+        self.subscribers = []
+        self.spectators = set()
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        for pid in [0, 1]:
+            self.clients[pid] = None
+            self.connected[pid] = False
+        self.finished = True
+
+
+class UdpProtocol(asyncio.DatagramProtocol):
+    """UDP-канал для знімків і введення. Пакети мають порядкові номери, тож
+    загублений пакет не затримує наступні, а застарілі просто відкидаються"""
+
+    def __init__(self, server):
+        self.server = server
+
+    def datagram_received(self, data, addr):
+        frame = decode_datagram(data)
+        if frame is None:
+            return
+        msg_type, payload = frame
+        if msg_type == MSG_UDP_HELLO:
+            self.server.bind_udp(bytes(payload), addr)
+            return
+        client = self.server.udp_clients.get(addr)
+        if client is not None and msg_type == MSG_INPUT:
+            client.handle_input_frame(payload)
+
+
+class GameServer:
+    """Сервер, що приймає гравців безперервно і проводить багато матчів одночасно.
+
+    Усі сокети і вся симуляція обслуговуються одним циклом подій asyncio
+    без потоків і блокувань.
+    """
+
+    def __init__(self, host='localhost', port=8080, tick_rate=TICK_RATE, udp=False, batch=False, udp_port=None,
+                 pairing=(), replay_dir=None, seed=None):
+        self.host = host
+        self.port = port
+        # Каталог для реплеїв матчів; None - не записувати
+        self.replay_dir = replay_dir
+        # Джерело зерен матчів; з --seed увесь запуск сервера відтворюваний
+        self.seeds = random.Random(seed)
+        # Воркери супервізора ділять TCP-порт, але кожен слухає UDP на своєму
+        self.udp_port = udp_port or port
+        # Пакетний рушій на NumPy крокує всі матчі разом, але має сталі витрати
+        # на крок і обганяє PongSimulation лише на сотнях матчів - тому вмикається явно
+        self.batch = BatchSimulation() if batch and BatchSimulation.available() else None
+        self.udp = udp
+        self.udp_transport = None
+        self.udp_tokens = {}
+        self.udp_clients = {}
+        self.matches = {}
+        self.match_ids = itertools.count(1)
+        # Матчі з одним гравцем, що чекають суперника, за критеріями підбору
+        self.lobby = Lobby(pairing)
+        self.scheduler = TickScheduler(tick_rate)
+        self.metrics = {"dropped_snapshots": 0, "lag_disconnects": 0}
+        self.stats_interval = STATS_INTERVAL
+        self.next_stats_tick = self.stats_interval * tick_rate
+
+    def tick(self, dt):
+        """Один крок симуляції для всіх активних матчів"""
+        matches = list(self.matches.values())
+        for match in matches:
+            match.record_inputs()
+        if self.batch is not None:
+            indices, keys = [], []
+            for match in matches:
+                indices.append(match.simulation.index)
+                keys += (match.keys[0], match.keys[1])
+            self.batch.load_inputs(indices, keys)
+            self.batch.step(dt)
+        for match in matches:
+            match.update(dt)
+            if match.finished:
+                del self.matches[match.match_id]
+                if self.batch is not None:
+                    self.batch.release(match.simulation)
+                print(f"[матч {match.match_id}] Завершено. Активних матчів: {len(self.matches)}")
+
+        if self.scheduler.tick >= self.next_stats_tick:
+            self.next_stats_tick += self.stats_interval * self.scheduler.tick_rate
+            self.report_stats()
+
+    def stats(self) -> dict:
+        return {
+            "matches": len(self.matches),
+            "network": dict(self.metrics),
+            "scheduler": self.scheduler.stats(),
+            "lobby": self.lobby.stats(),
+            "spectators": sum(len(match.spectators) for match in self.matches.values()),
         }
-        self.countdown = COUNTDOWN_START
-        self.game_over = False
-        self.winner = None
 
-    def handle_client(self, pid):
-        conn = self.clients[pid]
+    def report_stats(self):
+        print(f"📊 Матчів: {len(self.matches)}, мережа: {self.metrics}, черга: {self.lobby.stats()}, "
+              f"планувальник: {self.scheduler.stats()}")
+
+    def register_udp(self, client):
+        """Видати клієнту токен, яким він підтвердить свою UDP-адресу"""
+        if self.udp_transport is None:
+            return None
+        client.udp_token = secrets.token_bytes(8)
+        self.udp_tokens[client.udp_token] = client
+        return client.udp_token
+
+    def bind_udp(self, token, addr):
+        client = self.udp_tokens.get(token)
+        if client is None or client.udp_addr == addr:
+            return
+        if client.udp_addr is not None:
+            self.udp_clients.pop(client.udp_addr, None)
+        client.udp_addr = addr
+        self.udp_clients[addr] = client
+
+    def forget_udp(self, client):
+        self.udp_tokens.pop(client.udp_token, None)
+        self.udp_clients.pop(client.udp_addr, None)
+
+    def seat_player(self, client):
+        """Посадити гравця навпроти суперника з черги або відкрити новий матч"""
+        match = self.lobby.pop(client.player_info)
+        if match is None:
+            match = self.open_match(client)
+            self.lobby.push(client.player_info, match)
+        else:
+            self.start_match(match, client)
+
+    def add_spectator(self, client):
+        """Підписати глядача на вказаний матч або, без номера, на найновіший"""
+        match_id = client.player_info.get("match")
+        if match_id is not None:
+            match = self.matches.get(match_id)
+        else:
+            match = next(reversed(self.matches.values()), None)
+        if match is None or not match.add_spectator(client):
+            client.send((json.dumps({"error": "немає доступного матчу"}) + "\n").encode())
+            client.close()
+
+    def unseat(self, match):
+        """Гравець пішов, не дочекавшись суперника - закрити його місце в черзі"""
+        self.lobby.remove(match)
+
+    def open_match(self, client):
+        match = Match(next(self.match_ids))
+        match.add_player(client)
+        return match
+
+    def start_match(self, match, client):
+        match.add_player(client)
+        # Власне зерно в кожного матчу: з нього і журналу введення матч відтворюється
+        seed = self.seeds.getrandbits(32)
+        rng = random.Random(seed)
+        simulation = self.batch.add(rng) if self.batch is not None else PongSimulation(rng)
+        match.start(simulation, self.start_recorder(match, seed))
+        self.matches[match.match_id] = match
+        print(f"[матч {match.match_id}] Старт. Активних матчів: {len(self.matches)}")
+
+    def start_recorder(self, match, seed):
+        if self.replay_dir is None:
+            return None
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-match{match.match_id}.replay"
+        meta = {"match": match.match_id, "players": match.player_names(), "started": time.time()}
         try:
-            while True:
-                data = conn.recv(64).decode()
-                with self.lock:
-                    if data == "UP":
-                        self.paddles[pid] = max(60, self.paddles[pid] - PADDLE_SPEED)
-                    elif data == "DOWN":
-                        self.paddles[pid] = min(HEIGHT - 100, self.paddles[pid] + PADDLE_SPEED)
-        except:
-            with self.lock:
-                self.connected[pid] = False
-                self.game_over = True
-                self.winner = 1 - pid  # інший гравець автоматично виграє
-                print(f"Гравець {pid} відключився. Переміг гравець {1 - pid}.")
-
-    def broadcast_state(self):
-        state = json.dumps({
-            "paddles": self.paddles,
-            "ball": self.ball,
-            "scores": self.scores,
-            "countdown": max(self.countdown, 0),
-            "winner": self.winner if self.game_over else None,
-            "sound_event": self.sound_event
-        }) + "\n"
-        for pid, conn in self.clients.items():
-            if conn:
-                try:
-                    conn.sendall(state.encode())
-                except:
-                    self.connected[pid] = False
-
-    def ball_logic(self):
-        while self.countdown > 0:
-            time.sleep(1)
-            with self.lock:
-                self.countdown -= 1
-                self.broadcast_state()
-
-        while not self.game_over:
-            with self.lock:
-                self.ball['x'] += self.ball['vx']
-                self.ball['y'] += self.ball['vy']
-
-                if self.ball['y'] <= 60 or self.ball['y'] >= HEIGHT:
-                    self.ball['vy'] *= -1
-                    self.sound_event = "wall_hit"
-
-                if (self.ball['x'] <= 40 and self.paddles[0] <= self.ball['y'] <= self.paddles[0] + 100) or \
-                   (self.ball['x'] >= WIDTH - 40 and self.paddles[1] <= self.ball['y'] <= self.paddles[1] + 100):
-                    self.ball['vx'] *= -1
-                    self.sound_event = 'platform_hit'
-
-                if self.ball['x'] < 0:
-                    self.scores[1] += 1
-                    self.sound_event = 'score'
-                    self.reset_ball()
-                elif self.ball['x'] > WIDTH:
-                    self.scores[0] += 1
-                    self.sound_event = 'score'
-                    self.reset_ball()
-
-                if self.scores[0] >= 10:
-                    self.game_over = True
-                    self.winner = 0
-                elif self.scores[1] >= 10:
-                    self.game_over = True
-                    self.winner = 1
-
-                self.broadcast_state()
-                self.sound_event = None
-            time.sleep(0.016)
-
-    def reset_ball(self):
-        self.ball = {
-            "x": WIDTH // 2,
-            "y": HEIGHT // 2,
-            "vx": BALL_SPEED * random.choice([-1, 1]),
-            "vy": BALL_SPEED * random.choice([-1, 1])
-        }
+            return ReplayRecorder(os.path.join(self.replay_dir, name), seed, self.scheduler.tick_rate, meta)
+        except OSError as e:
+            print(f"❌ Не вдалося почати запис реплею: {e}")
+            return None
 
-    def accept_players(self):
-        for pid in [0, 1]:
-            print(f"Очікуємо гравця {pid}...")
-            conn, _ = self.server.accept()
-            self.clients[pid] = conn
-            conn.sendall((str(pid) + "\n").encode())
-            self.connected[pid] = True
-            print(f"Гравець {pid} приєднався")
-            threading.Thread(target=self.handle_client, args=(pid,), daemon=True).start()
+    async def adopt(self, sock, handshake: bytes):
+        """Прийняти вже відкритий сокет гравця разом із прочитаним рукостисканням"""
+        loop = asyncio.get_running_loop()
+        _, client = await loop.connect_accepted_socket(lambda: ClientProtocol(self), sock)
+        client.data_received(handshake)
+
+    async def open_udp(self):
+        if self.udp:
+            loop = asyncio.get_running_loop()
+            self.udp_transport, _ = await loop.create_datagram_endpoint(
+                lambda: UdpProtocol(self), local_addr=(self.host, self.udp_port)
+            )
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        server = await loop.create_server(
+            lambda: ClientProtocol(self), self.host, self.port,
+            backlog=LISTEN_BACKLOG, reuse_address=True
+        )
+        await self.open_udp()
+        engine = "NumPy" if self.batch is not None else "Python"
+        print(f"🎮 Server started ({self.scheduler.tick_rate} Гц, рушій {engine}{', UDP' if self.udp else ''})")
+        print("Очікуємо гравців...")
+        async with server:
+            await self.scheduler.run(self.tick)
 
     def run(self):
-        while True:
-            self.accept_players()
-            self.reset_game_state()
-            threading.Thread(target=self.ball_logic, daemon=True).start()
-
-            while not self.game_over and all(self.connected.values()):
-                time.sleep(0.1)
-
-            print(f"Гравець {self.winner} переміг!")
-            time.sleep(5)
-
-            # Закриваємо старі з'єднання
-            for pid in [0, 1]:
-                try:
-                    self.clients[pid].close()
-                except:
-                    pass
-                self.clients[pid] = None
-                self.connected[pid] = False
-
-GameServer().run()
\ No newline at end of file
+        asyncio.run(self.serve())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сервер Пінг-Понгу")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--tick-rate", type=int, default=TICK_RATE, help="кроків симуляції за секунду")
+    parser.add_argument("--udp", action="store_true", help="дозволити знімки і введення по UDP")
+    parser.add_argument("--batch", action="store_true",
+                        help="крокувати всі матчі разом на NumPy (вигідно від ~200 одночасних матчів)")
+    parser.add_argument("--pairing", type=parse_pairing, default=PAIRING_FIFO, help="підбір суперників: fifo, region, skill або region,skill")
+    parser.add_argument("--replays", metavar="DIR", default=None, help="записувати реплеї матчів у каталог")
+    parser.add_argument("--seed", type=int, default=None, help="зерно для відтворюваних матчів")
+    args = parser.parse_args()
+    GameServer(args.host, args.port, args.tick_rate, args.udp, args.batch,
+               pairing=args.pairing, replay_dir=args.replays, seed=args.seed).run()
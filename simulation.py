@@ -0,0 +1,552 @@
+"""
+Ігровий рушій Пінг-Понгу без мережі
+Чиста симуляція одного матчу: сервер, боти, реплеї та бенчмарки
+викликають один і той самий step(inputs, dt)
+
+М'яч рухається з неперервним виявленням зіткнень: за крок шукається точний
+момент удару об стіну або лицьову сторону платформи, м'яч відбивається саме
+там і рухається далі рештою часу. Тому м'яч не пролітає крізь платформу і
+не застрягає у стіні навіть при низькій частоті кроків або великій швидкості.
+"""
+
+import argparse
+import random
+import time
+from typing import List, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # пакетний рушій недоступний, лишається PongSimulation
+    np = None
+
+WIDTH, HEIGHT = 800, 600
+BALL_SPEED = 300  # пікселів за секунду (5 пікселів за крок при 60 Гц)
+PADDLE_SPEED = 600  # пікселів за секунду, поки клавіша утримується
+PADDLE_STEP = 10  # пікселів за одну команду старого формату "UP"/"DOWN"
+PADDLE_HEIGHT = 100
+PADDLE_MIN_Y = 60
+PADDLE_MAX_Y = HEIGHT - PADDLE_HEIGHT
+PADDLE_START_Y = 250
+LEFT_PADDLE_X = 40  # лицьова сторона лівої платформи
+RIGHT_PADDLE_X = WIDTH - 40
+WALL_TOP = 60
+BALL_SPEEDUP = 1.05  # множник швидкості м'яча після кожного удару платформою
+MAX_BALL_SPEED = 900  # пікселів за секунду по кожній осі
+MAX_BOUNCES = 4  # максимум зіткнень, що розраховуються за один крок
+COUNTDOWN_START = 3
+WIN_SCORE = 10
+
+# Маска утримуваних клавіш у введенні гравця
+KEY_UP = 1
+KEY_DOWN = 2
+
+# Події кроку
+EVENT_WALL_HIT = "wall_hit"
+EVENT_PLATFORM_HIT = "platform_hit"
+EVENT_SCORE = "score"
+EVENT_COUNTDOWN = "countdown"
+EVENT_GAME_OVER = "game_over"
+
+# Стовпці пакетного рушія, що після кожного кроку читаються у списки Python (view)
+BATCH_VIEW_FIELDS = ("tick", "paddle0", "paddle1", "x", "y", "vx", "vy", "score0", "score1",
+                     "countdown", "game_over", "winner", "events")
+VIEW_TICK, VIEW_COUNTDOWN, VIEW_GAME_OVER, VIEW_WINNER, VIEW_EVENTS = (
+    BATCH_VIEW_FIELDS.index(name) for name in ("tick", "countdown", "game_over", "winner", "events")
+)
+
+# Бітові прапорці подій для пакетного рушія (у порядку додавання подій)
+EVENT_BITS = [
+    (1, EVENT_COUNTDOWN),
+    (2, EVENT_WALL_HIT),
+    (4, EVENT_PLATFORM_HIT),
+    (8, EVENT_SCORE),
+    (16, EVENT_GAME_OVER),
+]
+
+
+class PongSimulation:
+    """Стан і правила одного матчу.
+
+    step(inputs, dt) приймає маски клавіш обох гравців і повертає новий стан
+    та список подій за крок. Випадковість береться лише з власного self.rng,
+    тож матч із тим самим зерном і введенням повторюється до біта.
+    """
+
+    def __init__(self, rng=None, seed=None):
+        self.rng = rng if rng is not None else random.Random(seed)
+        self.tick = 0
+        self.reset()
+
+    def reset(self):
+        self.paddles = {0: PADDLE_START_Y, 1: PADDLE_START_Y}
+        self.scores = [0, 0]
+        self.reset_ball()
+        self.countdown = COUNTDOWN_START
+        self.countdown_timer = 1.0
+        self.game_over = False
+        self.winner = None
+
+    def reset_ball(self):
+        self.ball = {
+            "x": WIDTH // 2,
+            "y": HEIGHT // 2,
+            "vx": BALL_SPEED * self.rng.choice([-1, 1]),
+            "vy": BALL_SPEED * self.rng.choice([-1, 1])
+        }
+
+    def state(self) -> dict:
+        """Копія поточного стану (наступні кроки її не змінюють)"""
+        return {
+            "tick": self.tick,
+            "paddles": dict(self.paddles),
+            "ball": dict(self.ball),
+            "scores": list(self.scores),
+            "countdown": max(self.countdown, 0),
+            "winner": self.winner if self.game_over else None,
+        }
+
+    def paddle(self, pid: int) -> float:
+        return self.paddles[pid]
+
+    def nudge_paddle(self, pid: int, command: str):
+        """Одноразовий зсув платформи (старий формат введення)"""
+        if command == "UP":
+            self.paddles[pid] = max(PADDLE_MIN_Y, self.paddles[pid] - PADDLE_STEP)
+        elif command == "DOWN":
+            self.paddles[pid] = min(PADDLE_MAX_Y, self.paddles[pid] + PADDLE_STEP)
+
+    def forfeit(self, pid: int):
+        """Гравець покинув матч - перемагає суперник"""
+        if not self.game_over:
+            self.game_over = True
+            self.winner = 1 - pid
+
+    def move_paddles(self, inputs, dt: float):
+        for pid in (0, 1):
+            keys = inputs[pid]
+            if keys & KEY_UP and not keys & KEY_DOWN:
+                self.paddles[pid] = max(PADDLE_MIN_Y, self.paddles[pid] - PADDLE_SPEED * dt)
+            elif keys & KEY_DOWN and not keys & KEY_UP:
+                self.paddles[pid] = min(PADDLE_MAX_Y, self.paddles[pid] + PADDLE_SPEED * dt)
+
+    def move_ball(self, dt: float, events: List[str]):
+        ball = self.ball
+        wall_hit = platform_hit = False
+        remaining = dt
+        for _ in range(MAX_BOUNCES):
+            # Найближче зіткнення за решту кроку: стіна, ліва або права платформа
+            t, surface = remaining, None
+            if ball['vy'] < 0:
+                hit = max(0.0, (WALL_TOP - ball['y']) / ball['vy'])
+                if hit <= t:
+                    t, surface = hit, "wall"
+            elif ball['vy'] > 0:
+                hit = max(0.0, (HEIGHT - ball['y']) / ball['vy'])
+                if hit <= t:
+                    t, surface = hit, "wall"
+            if ball['vx'] < 0 and ball['x'] >= LEFT_PADDLE_X:
+                hit = (LEFT_PADDLE_X - ball['x']) / ball['vx']
+                y_hit = ball['y'] + ball['vy'] * hit
+                if hit <= t and self.paddles[0] <= y_hit <= self.paddles[0] + PADDLE_HEIGHT:
+                    t, surface = hit, "paddle"
+            elif ball['vx'] > 0 and ball['x'] <= RIGHT_PADDLE_X:
+                hit = (RIGHT_PADDLE_X - ball['x']) / ball['vx']
+                y_hit = ball['y'] + ball['vy'] * hit
+                if hit <= t and self.paddles[1] <= y_hit <= self.paddles[1] + PADDLE_HEIGHT:
+                    t, surface = hit, "paddle"
+
+            ball['x'] += ball['vx'] * t
+            ball['y'] += ball['vy'] * t
+            remaining -= t
+            if surface is None:
+                break
+            if surface == "wall":
+                ball['vy'] = -ball['vy']
+                wall_hit = True
+            else:
+                ball['vx'] = max(-MAX_BALL_SPEED, min(MAX_BALL_SPEED, -ball['vx'] * BALL_SPEEDUP))
+                ball['vy'] = max(-MAX_BALL_SPEED, min(MAX_BALL_SPEED, ball['vy'] * BALL_SPEEDUP))
+                platform_hit = True
+            if remaining <= 0:
+                break
+
+        if wall_hit:
+            events.append(EVENT_WALL_HIT)
+        if platform_hit:
+            events.append(EVENT_PLATFORM_HIT)
+
+        if ball['x'] < 0:
+            self.scores[1] += 1
+            events.append(EVENT_SCORE)
+            self.reset_ball()
+        elif ball['x'] > WIDTH:
+            self.scores[0] += 1
+            events.append(EVENT_SCORE)
+            self.reset_ball()
+
+    def step(self, inputs, dt: float) -> Tuple[dict, List[str]]:
+        """Один фіксований крок: платформи, відлік або м'яч, рахунок"""
+        self.tick += 1
+        events = []
+        if self.game_over:
+            return self.state(), events
+
+        self.move_paddles(inputs, dt)
+        if self.countdown > 0:
+            self.countdown_timer -= dt
+            if self.countdown_timer <= 0:
+                self.countdown -= 1
+                self.countdown_timer += 1.0
+                events.append(EVENT_COUNTDOWN)
+            return self.state(), events
+
+        self.move_ball(dt, events)
+
+        if self.scores[0] >= WIN_SCORE:
+            self.game_over = True
+            self.winner = 0
+        elif self.scores[1] >= WIN_SCORE:
+            self.game_over = True
+            self.winner = 1
+        if self.game_over:
+            events.append(EVENT_GAME_OVER)
+        return self.state(), events
+
+
+class BatchSimulation:
+    """Пакетний рушій: стан усіх матчів у масивах NumPy (структура масивів).
+
+    Один виклик step(dt) просуває всі активні матчі однаковими векторними
+    операціями з тими самими правилами й порядком обчислень, що й
+    PongSimulation, тож результати збігаються до біта. Доступ до окремого
+    матчу - через BatchSlot з інтерфейсом PongSimulation.
+
+    Читання окремих скалярів NumPy коштує дорожче за сам векторний крок,
+    тому після кроку масиви один раз переносяться у списки Python (view),
+    і матчі читають свій стан уже з них.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self.capacity = 0
+        self.free = []
+        self.view = ()
+        self._allocate(capacity)
+
+    @staticmethod
+    def available() -> bool:
+        return np is not None
+
+    def _allocate(self, capacity: int):
+        """Створити або збільшити масиви до capacity матчів"""
+        def grow(array, shape_tail=(), dtype=np.float64, fill=0):
+            new = np.full((capacity,) + shape_tail, fill, dtype=dtype)
+            if array is not None:
+                new[:len(array)] = array
+            return new
+
+        old = self.capacity
+        self.x = grow(getattr(self, "x", None))
+        self.y = grow(getattr(self, "y", None))
+        self.vx = grow(getattr(self, "vx", None))
+        self.vy = grow(getattr(self, "vy", None))
+        self.paddles = grow(getattr(self, "paddles", None), (2,))
+        self.keys = grow(getattr(self, "keys", None), (2,), np.uint8)
+        self.scores = grow(getattr(self, "scores", None), (2,), np.int32)
+        self.countdown = grow(getattr(self, "countdown", None), (), np.int32)
+        self.countdown_timer = grow(getattr(self, "countdown_timer", None))
+        self.game_over = grow(getattr(self, "game_over", None), (), np.bool_, False)
+        self.winner = grow(getattr(self, "winner", None), (), np.int8, -1)
+        self.tick = grow(getattr(self, "tick", None), (), np.int64)
+        self.active = grow(getattr(self, "active", None), (), np.bool_, False)
+        self.events = grow(getattr(self, "events", None), (), np.uint8)
+        self.rngs = getattr(self, "rngs", []) + [None] * (capacity - old)
+        self.free.extend(range(capacity - 1, old - 1, -1))
+        self.capacity = capacity
+        self.sync()
+
+    def sync(self):
+        """Прочитати масиви у списки Python одним викликом tolist() на стовпець
+        (у порядку BATCH_VIEW_FIELDS)"""
+        paddles, scores = self.paddles, self.scores
+        self.view = (
+            self.tick.tolist(), paddles[:, 0].tolist(), paddles[:, 1].tolist(),
+            self.x.tolist(), self.y.tolist(), self.vx.tolist(), self.vy.tolist(),
+            scores[:, 0].tolist(), scores[:, 1].tolist(),
+            self.countdown.tolist(), self.game_over.tolist(), self.winner.tolist(), self.events.tolist(),
+        )
+
+    def add(self, rng=None, seed=None) -> "BatchSlot":
+        """Зайняти вільне місце під новий матч"""
+        if not self.free:
+            self._allocate(self.capacity * 2)
+        index = self.free.pop()
+        self.rngs[index] = rng if rng is not None else random.Random(seed)
+        self.tick[index] = 0
+        self.keys[index] = 0
+        self.events[index] = 0
+        self.active[index] = True
+        slot = BatchSlot(self, index)
+        slot.reset()
+        self.sync()
+        return slot
+
+    def release(self, slot: "BatchSlot"):
+        self.active[slot.index] = False
+        self.rngs[slot.index] = None
+        self.free.append(slot.index)
+
+    def load_inputs(self, indices, keys):
+        """Маски клавіш усіх матчів одним присвоєнням.
+        keys - плоский список: гравець 0 і гравець 1 для кожного місця з indices"""
+        if indices:
+            self.keys[indices] = np.fromiter(keys, np.uint8, len(keys)).reshape(-1, 2)
+
+    def reset_ball(self, index: int):
+        rng = self.rngs[index]
+        self.x[index] = WIDTH // 2
+        self.y[index] = HEIGHT // 2
+        self.vx[index] = BALL_SPEED * rng.choice([-1, 1])
+        self.vy[index] = BALL_SPEED * rng.choice([-1, 1])
+
+    def move_balls(self, playing, dt: float):
+        remaining = np.where(playing, dt, 0.0)
+        moving = playing.copy()
+        left, right = self.paddles[:, 0], self.paddles[:, 1]
+        for _ in range(MAX_BOUNCES):
+            if not moving.any():
+                break
+            x, y, vx, vy = self.x, self.y, self.vx, self.vy
+            t = remaining.copy()
+            surface = np.zeros(self.capacity, dtype=np.int8)  # 0 - немає, 1 - стіна, 2 - платформа
+            with np.errstate(divide="ignore", invalid="ignore"):
+                top = moving & (vy < 0)
+                hit = np.maximum(0.0, (WALL_TOP - y) / vy)
+                sel = top & (hit <= t)
+                t = np.where(sel, hit, t)
+                surface[sel] = 1
+
+                bottom = moving & (vy > 0)
+                hit = np.maximum(0.0, (HEIGHT - y) / vy)
+                sel = bottom & (hit <= t)
+                t = np.where(sel, hit, t)
+                surface[sel] = 1
+
+                towards_left = moving & (vx < 0) & (x >= LEFT_PADDLE_X)
+                hit = (LEFT_PADDLE_X - x) / vx
+                y_hit = y + vy * hit
+                sel = towards_left & (hit <= t) & (left <= y_hit) & (y_hit <= left + PADDLE_HEIGHT)
+                t = np.where(sel, hit, t)
+                surface[sel] = 2
+
+                towards_right = moving & (vx > 0) & (x <= RIGHT_PADDLE_X)
+                hit = (RIGHT_PADDLE_X - x) / vx
+                y_hit = y + vy * hit
+                sel = towards_right & (hit <= t) & (right <= y_hit) & (y_hit <= right + PADDLE_HEIGHT)
+                t = np.where(sel, hit, t)
+                surface[sel] = 2
+
+            self.x = np.where(moving, x + vx * t, x)
+            self.y = np.where(moving, y + vy * t, y)
+            remaining = np.where(moving, remaining - t, remaining)
+
+            wall = moving & (surface == 1)
+            self.vy = np.where(wall, -vy, vy)
+            self.events[wall] |= 2
+
+            paddle = moving & (surface == 2)
+            self.vx = np.where(paddle, np.clip(-vx * BALL_SPEEDUP, -MAX_BALL_SPEED, MAX_BALL_SPEED), self.vx)
+            self.vy = np.where(paddle, np.clip(self.vy * BALL_SPEEDUP, -MAX_BALL_SPEED, MAX_BALL_SPEED), self.vy)
+            self.events[paddle] |= 4
+
+            moving &= (surface != 0) & (remaining > 0)
+
+    def step(self, dt: float):
+        """Один фіксований крок для всіх активних матчів"""
+        self.tick[self.active] += 1
+        self.events[:] = 0
+        live = self.active & ~self.game_over
+
+        # Платформи
+        keys = self.keys
+        up = ((keys & KEY_UP) != 0) & ((keys & KEY_DOWN) == 0) & live[:, None]
+        down = ((keys & KEY_DOWN) != 0) & ((keys & KEY_UP) == 0) & live[:, None]
+        self.paddles = np.where(up, np.maximum(PADDLE_MIN_Y, self.paddles - PADDLE_SPEED * dt), self.paddles)
+        self.paddles = np.where(down, np.minimum(PADDLE_MAX_Y, self.paddles + PADDLE_SPEED * dt), self.paddles)
+
+        # Відлік
+        counting = live & (self.countdown > 0)
+        self.countdown_timer[counting] -= dt
+        fired = counting & (self.countdown_timer <= 0)
+        self.countdown[fired] -= 1
+        self.countdown_timer[fired] += 1.0
+        self.events[fired] |= 1
+
+        # М'яч: ті самі зіткнення, що й у PongSimulation.move_ball, для всіх матчів
+        playing = live & ~counting
+        self.move_balls(playing, dt)
+        x = self.x
+
+        # Голи рідкісні, тож перезапуск м'яча (з ГВЧ кожного матчу) - звичайним циклом
+        scored_right = playing & (x < 0)
+        scored_left = playing & ~scored_right & (x > WIDTH)
+        self.scores[scored_right, 1] += 1
+        self.scores[scored_left, 0] += 1
+        scored = scored_right | scored_left
+        self.events[scored] |= 8
+        for index in np.flatnonzero(scored):
+            self.reset_ball(index)
+
+        won_left = playing & (self.scores[:, 0] >= WIN_SCORE)
+        won_right = playing & ~won_left & (self.scores[:, 1] >= WIN_SCORE)
+        self.winner[won_left] = 0
+        self.winner[won_right] = 1
+        finished = won_left | won_right
+        self.game_over |= finished
+        self.events[finished] |= 16
+        self.sync()
+
+
+class BatchSlot:
+    """Один матч у BatchSimulation з інтерфейсом PongSimulation.
+
+    Крок виконує BatchSimulation.step() для всіх матчів разом, тому тут
+    step() лише повертає його результат для цього матчу зі списків view,
+    а введення передається заздалегідь через BatchSimulation.load_inputs().
+    """
+
+    def __init__(self, batch: BatchSimulation, index: int):
+        self.batch = batch
+        self.index = index
+
+    @property
+    def tick(self) -> int:
+        return self.batch.view[VIEW_TICK][self.index]
+
+    @property
+    def countdown(self) -> int:
+        return self.batch.view[VIEW_COUNTDOWN][self.index]
+
+    @property
+    def game_over(self) -> bool:
+        return self.batch.view[VIEW_GAME_OVER][self.index]
+
+    @property
+    def winner(self):
+        winner = self.batch.view[VIEW_WINNER][self.index]
+        return None if winner < 0 else winner
+
+    def reset(self):
+        b, i = self.batch, self.index
+        b.paddles[i] = PADDLE_START_Y
+        b.scores[i] = 0
+        b.reset_ball(i)
+        b.countdown[i] = COUNTDOWN_START
+        b.countdown_timer[i] = 1.0
+        b.game_over[i] = False
+        b.winner[i] = -1
+
+    def state(self) -> dict:
+        """Стан після останнього кроку (зі списків view, без читання масивів)"""
+        tick, paddle0, paddle1, x, y, vx, vy, score0, score1, countdown, game_over, winner, _ = self.batch.view
+        i = self.index
+        return {
+            "tick": tick[i],
+            "paddles": {0: paddle0[i], 1: paddle1[i]},
+            "ball": {"x": x[i], "y": y[i], "vx": vx[i], "vy": vy[i]},
+            "scores": [score0[i], score1[i]],
+            "countdown": max(countdown[i], 0),
+            "winner": winner[i] if game_over[i] and winner[i] >= 0 else None,
+        }
+
+    def step(self, inputs, dt: float) -> Tuple[dict, List[str]]:
+        flags = self.batch.view[VIEW_EVENTS][self.index]
+        return self.state(), [name for bit, name in EVENT_BITS if flags & bit] if flags else []
+
+    def paddle(self, pid: int) -> float:
+        return float(self.batch.paddles[self.index, pid])
+
+    def nudge_paddle(self, pid: int, command: str):
+        paddles = self.batch.paddles[self.index]
+        if command == "UP":
+            paddles[pid] = max(PADDLE_MIN_Y, paddles[pid] - PADDLE_STEP)
+        elif command == "DOWN":
+            paddles[pid] = min(PADDLE_MAX_Y, paddles[pid] + PADDLE_STEP)
+
+    def forfeit(self, pid: int):
+        if not self.game_over:
+            # Пишемо і в масиви, і у view: до наступного кроку стан читається з view
+            self.batch.game_over[self.index] = True
+            self.batch.winner[self.index] = 1 - pid
+            self.batch.view[VIEW_GAME_OVER][self.index] = True
+            self.batch.view[VIEW_WINNER][self.index] = 1 - pid
+
+
+def benchmark(ticks: int, tick_rate: int = 60) -> float:
+    """Прогнати симуляцію без мережі і повернути кількість кроків за секунду"""
+    sim = PongSimulation(seed=0)
+    dt = 1.0 / tick_rate
+    inputs = {0: 0, 1: 0}
+    started = time.perf_counter()
+    for tick in range(ticks):
+        if sim.game_over:
+            sim.reset()
+        # Прості боти: платформа тягнеться за м'ячем
+        for pid in (0, 1):
+            center = sim.paddles[pid] + PADDLE_HEIGHT / 2
+            inputs[pid] = KEY_UP if sim.ball['y'] < center - 10 else KEY_DOWN if sim.ball['y'] > center + 10 else 0
+        sim.step(inputs, dt)
+    return ticks / (time.perf_counter() - started)
+
+
+def verify(matches: int = 30, ticks: int = 20000, tick_rate: int = 60, seed: int = 0) -> int:
+    """Прогнати однакові матчі в PongSimulation і BatchSimulation з випадковим
+    введенням і повернути кількість кроків, де стани чи події розійшлися"""
+    rng = random.Random(seed)
+    dt = 1.0 / tick_rate
+    # Мала початкова місткість - щоб перевірити і збільшення масивів
+    batch = BatchSimulation(capacity=4)
+    sims = [PongSimulation(seed=i) for i in range(matches)]
+    slots = [batch.add(seed=i) for i in range(matches)]
+    mismatches = 0
+    for tick in range(ticks):
+        inputs = [{0: rng.randrange(4), 1: rng.randrange(4)} for _ in range(matches)]
+        # Зрідка - команди старого формату та здача матчу
+        if rng.random() < 0.05:
+            k, pid, command = rng.randrange(matches), rng.randrange(2), rng.choice(("UP", "DOWN"))
+            sims[k].nudge_paddle(pid, command)
+            slots[k].nudge_paddle(pid, command)
+        if rng.random() < 0.001:
+            k, pid = rng.randrange(matches), rng.randrange(2)
+            sims[k].forfeit(pid)
+            slots[k].forfeit(pid)
+        batch.load_inputs([slot.index for slot in slots], [keys for pair in inputs for keys in (pair[0], pair[1])])
+        batch.step(dt)
+        for k in range(matches):
+            if sims[k].step(inputs[k], dt) != slots[k].step(inputs[k], dt):
+                mismatches += 1
+            if sims[k].game_over:
+                # Завершений матч звільняє місце, новий займає його з тим самим зерном
+                match_seed = rng.getrandbits(32)
+                batch.release(slots[k])
+                sims[k] = PongSimulation(seed=match_seed)
+                slots[k] = batch.add(seed=match_seed)
+    return mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк симуляції Пінг-Понгу")
+    parser.add_argument("--ticks", type=int, default=200000)
+    parser.add_argument("--verify", action="store_true",
+                        help="перевірити, що BatchSimulation збігається з PongSimulation до біта")
+    parser.add_argument("--matches", type=int, default=30, help="матчів для --verify")
+    parser.add_argument("--tick-rate", type=int, default=60)
+    args = parser.parse_args()
+    if args.verify:
+        if not BatchSimulation.available():
+            raise SystemExit("❌ Для перевірки пакетного рушія потрібен NumPy")
+        mismatches = verify(args.matches, min(args.ticks, 20000), args.tick_rate)
+        if mismatches:
+            raise SystemExit(f"❌ Рушії розійшлися на {mismatches} кроках")
+        print(f"✓ Рушії збігаються до біта ({args.matches} матчів)")
+    else:
+        print(f"⏱  {benchmark(args.ticks, args.tick_rate):,.0f} кроків/с")
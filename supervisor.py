@@ -0,0 +1,328 @@
+"""
+Супервізор Пінг-Понгу: кілька процесів-воркерів замість одного
+Один процес CPython займає лише одне ядро через GIL. Супервізор приймає
+гравців, читає їхнє рукостискання і передає сокет одному з воркерів
+(SCM_RIGHTS через Unix-сокет). Кожен воркер - звичайний GameServer зі своїми
+матчами і власним UDP-портом. Черга підбору суперників живе в супервізорі:
+гравець або займає відкрите місце у воркері, де його чекає суперник, або
+відкриває нове, тож гравці одного матчу завжди в одному процесі. Воркери щосекунди надсилають метрики,
+а супервізор виводить загальну картину.
+"""
+
+import asyncio
+import argparse
+import json
+import itertools
+import multiprocessing
+import os
+import socket
+import struct
+
+from lobby import PAIRING_FIFO, Lobby, parse_pairing
+from protocol import LEGACY_HANDSHAKE, MODE_SPECTATE
+from server import LEGACY_HANDSHAKE_TIMEOUT, LISTEN_BACKLOG, MAX_HANDSHAKE_SIZE, STATS_INTERVAL, TICK_RATE, GameServer
+
+HANDOFF_BUFFER = 64 * 1024  # максимальний розмір керуючого повідомлення між процесами
+REPORT_INTERVAL = 1  # секунд між звітами воркера супервізору
+
+# Передача гравця воркеру: номер місця, чи є там уже суперник, далі рукостискання.
+# Назад воркер надсилає JSON: {"report": ...}, {"closed": місце} або {"reopen": місце, "info": ...}
+HANDOFF_HEADER = struct.Struct("!IB")
+
+
+class WorkerServer(GameServer):
+    """GameServer у процесі-воркері: гравці приходять від супервізора, а не з listen-сокета"""
+
+    def __init__(self, index, workers, control, **kwargs):
+        super().__init__(**kwargs)
+        self.index = index
+        # Номери матчів унікальні між воркерами: за номером супервізор знаходить воркер глядачу
+        self.match_ids = itertools.count(index + 1, workers)
+        self.control = control
+        self.control.setblocking(False)
+        self.handoff_lock = None
+        self.main_task = None
+        self.stats_interval = REPORT_INTERVAL
+        self.next_stats_tick = self.stats_interval * self.scheduler.tick_rate
+        # Відкриті місця, видані супервізором: місце -> матч з одним гравцем
+        self.seats = {}
+        self.seat_ids = {}
+        self.next_seat = None
+
+    def send_message(self, message):
+        try:
+            self.control.send(json.dumps(message).encode())
+        except OSError as e:
+            print(f"❌ Воркер {self.index}: не вдалося написати супервізору: {e}")
+
+    def report_stats(self):
+        self.send_message({"report": {"worker": self.index, "pid": os.getpid(), **self.stats()}})
+
+    def seat_player(self, client):
+        """Посадити гравця на місце, яке призначив супервізор"""
+        seat, join = self.next_seat
+        match = self.seats.pop(seat, None)
+        if match is not None:
+            del self.seat_ids[match]
+            self.start_match(match, client)
+            return
+        match = self.open_match(client)
+        self.seats[seat] = match
+        self.seat_ids[match] = seat
+        if join:
+            # Суперник пішов, поки гравця передавали - місце знову відкрите
+            self.send_message({"reopen": seat, "info": client.player_info})
+
+    def unseat(self, match):
+        seat = self.seat_ids.pop(match, None)
+        if seat is not None:
+            del self.seats[seat]
+            self.send_message({"closed": seat})
+
+    def on_control(self):
+        try:
+            data, fds, _, _ = socket.recv_fds(self.control, HANDOFF_BUFFER, 1)
+        except BlockingIOError:
+            return
+        if not data:
+            # Супервізор завершився - завершуємось і ми
+            self.main_task.cancel()
+            return
+        seat, join = HANDOFF_HEADER.unpack_from(data)
+        for fd in fds:
+            sock = socket.socket(fileno=fd)
+            asyncio.get_running_loop().create_task(
+                self.adopt_player(sock, seat, join, data[HANDOFF_HEADER.size:])
+            )
+
+    async def adopt_player(self, sock, seat, join, handshake):
+        # Гравці мають сідати в матчі в порядку передачі, тому по черзі
+        async with self.handoff_lock:
+            self.next_seat = (seat, join)
+            await self.adopt(sock, handshake)
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        self.main_task = asyncio.current_task()
+        self.handoff_lock = asyncio.Lock()
+        await self.open_udp()
+        loop.add_reader(self.control.fileno(), self.on_control)
+        print(f"⚙️ Воркер {self.index} (pid {os.getpid()}) готовий")
+        await self.scheduler.run(self.tick)
+
+    def run(self):
+        try:
+            super().run()
+        except (asyncio.CancelledError, KeyboardInterrupt):
+            pass
+
+
+def run_worker(index, workers, control, inherited, options):
+    # Після fork воркер успадкував кінці каналів інших воркерів - вони йому не потрібні
+    for sock in inherited:
+        sock.close()
+    WorkerServer(index, workers, control, **options).run()
+
+
+class LobbyProtocol(asyncio.Protocol):
+    """Гравець у супервізорі до передачі воркеру: лише читаємо рукостискання"""
+
+    def __init__(self, supervisor):
+        self.supervisor = supervisor
+        self.transport = None
+        self.handshake = b""
+        self.legacy_timer = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.legacy_timer = asyncio.get_running_loop().call_later(LEGACY_HANDSHAKE_TIMEOUT, self.legacy_timeout)
+
+    def legacy_timeout(self):
+        # Старий клієнт чекає свій id мовчки - воркер поведе його за старими правилами
+        self.legacy_timer = None
+        if not self.handshake:
+            self.data_received(LEGACY_HANDSHAKE)
+
+    def data_received(self, data):
+        self.handshake += data
+        if b"\n" in self.handshake:
+            if self.legacy_timer is not None:
+                self.legacy_timer.cancel()
+                self.legacy_timer = None
+            self.supervisor.hand_off(self)
+        elif len(self.handshake) > MAX_HANDSHAKE_SIZE:
+            self.transport.close()
+
+    def connection_lost(self, exc):
+        if self.legacy_timer is not None:
+            self.legacy_timer.cancel()
+
+    def detach(self) -> int:
+        """Забрати копію дескриптора сокета і закрити транспорт без розриву з'єднання"""
+        self.transport.pause_reading()
+        fd = os.dup(self.transport.get_extra_info("socket").fileno())
+        self.transport.close()
+        return fd
+
+
+class Supervisor:
+    """Приймає гравців, підбирає суперників і розподіляє матчі між воркерами"""
+
+    def __init__(self, host='localhost', port=8080, workers=None, tick_rate=TICK_RATE, udp=False, batch=False,
+                 pairing=(), replay_dir=None, seed=None):
+        self.host = host
+        self.port = port
+        self.worker_count = workers or os.cpu_count() or 1
+        self.options = {"host": host, "port": port, "tick_rate": tick_rate, "udp": udp, "batch": batch,
+                        "replay_dir": replay_dir}
+        self.seed = seed
+        self.processes = []
+        self.controls = []
+        # Відкриті місця (гравець чекає суперника): місце -> номер воркера
+        self.lobby = Lobby(pairing)
+        self.seats = {}
+        self.seat_ids = itertools.count(1)
+        self.open_seats = [0] * self.worker_count
+        # Навантаження воркера: матчі з останнього звіту плюс відкриті після нього
+        self.load = [0] * self.worker_count
+        self.reports = [None] * self.worker_count
+        self.handoffs = 0
+
+    def start_workers(self):
+        for index in range(self.worker_count):
+            parent, child = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+            # Кожен воркер отримує власну послідовність зерен матчів
+            seed = None if self.seed is None else self.seed * self.worker_count + index
+            options = dict(self.options, udp_port=self.port + 1 + index, seed=seed)
+            process = multiprocessing.get_context("fork").Process(
+                target=run_worker, args=(index, self.worker_count, child, list(self.controls) + [parent], options), daemon=True
+            )
+            process.start()
+            child.close()
+            self.processes.append(process)
+            self.controls.append(parent)
+
+    def hand_off(self, player):
+        try:
+            info = json.loads(player.handshake.split(b"\n", 1)[0])
+        except ValueError:
+            info = {}
+        if not isinstance(info, dict):
+            info = {}
+        if info.get("mode") == MODE_SPECTATE:
+            self.send_player(player, self.spectator_worker(info), 0, 0)
+            return
+        seat = self.lobby.pop(info)
+        if seat is not None:
+            # Другий гравець - до суперника
+            index = self.seats.pop(seat)
+            self.open_seats[index] -= 1
+            join = 1
+        else:
+            seat = next(self.seat_ids)
+            index = min(range(self.worker_count), key=lambda i: self.load[i])
+            self.open_seat(seat, index, info)
+            self.load[index] += 1
+            join = 0
+        self.send_player(player, index, seat, join)
+
+    def spectator_worker(self, info) -> int:
+        """Воркер з потрібним матчем або, без номера, з найбільшою кількістю матчів"""
+        match_id = info.get("match")
+        if isinstance(match_id, int) and match_id > 0:
+            return (match_id - 1) % self.worker_count
+        return max(range(self.worker_count), key=lambda i: self.reports[i]["matches"] if self.reports[i] else 0)
+
+    def send_player(self, player, index, seat, join):
+        fd = player.detach()
+        try:
+            socket.send_fds(self.controls[index], [HANDOFF_HEADER.pack(seat, join) + player.handshake], [fd])
+        except OSError as e:
+            print(f"❌ Не вдалося передати гравця воркеру {index}: {e}")
+        finally:
+            os.close(fd)
+        self.handoffs += 1
+
+    def open_seat(self, seat, index, info):
+        self.seats[seat] = index
+        self.open_seats[index] += 1
+        self.lobby.push(info, seat)
+
+    def on_message(self, index):
+        try:
+            data = self.controls[index].recv(HANDOFF_BUFFER)
+        except BlockingIOError:
+            return
+        if not data:
+            print(f"❌ Воркер {index} завершився")
+            asyncio.get_running_loop().remove_reader(self.controls[index].fileno())
+            self.load[index] = float("inf")
+            return
+        message = json.loads(data)
+        if "report" in message:
+            self.reports[index] = message["report"]
+            self.load[index] = message["report"]["matches"] + self.open_seats[index]
+        elif "closed" in message:
+            # Гравець пішов, не дочекавшись суперника
+            if self.seats.pop(message["closed"], None) is not None:
+                self.open_seats[index] -= 1
+                self.lobby.remove(message["closed"])
+        elif "reopen" in message:
+            self.open_seat(message["reopen"], index, message["info"])
+
+    def stats(self) -> dict:
+        reports = [report for report in self.reports if report]
+        return {
+            "workers": len(reports),
+            "matches": sum(report["matches"] for report in reports),
+            "handoffs": self.handoffs,
+            "lobby": self.lobby.stats(),
+            "dropped_snapshots": sum(report["network"]["dropped_snapshots"] for report in reports),
+            "lag_disconnects": sum(report["network"]["lag_disconnects"] for report in reports),
+            "actual_rates": [report["scheduler"]["actual_rate"] for report in reports],
+        }
+
+    async def print_stats(self):
+        while True:
+            await asyncio.sleep(STATS_INTERVAL)
+            print(f"📊 Супервізор: {self.stats()}")
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        for index, control in enumerate(self.controls):
+            control.setblocking(False)
+            loop.add_reader(control.fileno(), self.on_message, index)
+        server = await loop.create_server(
+            lambda: LobbyProtocol(self), self.host, self.port,
+            backlog=LISTEN_BACKLOG, reuse_address=True
+        )
+        print(f"🎮 Supervisor started: {self.worker_count} воркерів, порт {self.port}")
+        print("Очікуємо гравців...")
+        async with server:
+            await self.print_stats()
+
+    def run(self):
+        # Воркери створюються до запуску циклу подій, щоб fork не копіював його стан
+        self.start_workers()
+        try:
+            asyncio.run(self.serve())
+        finally:
+            for process in self.processes:
+                process.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сервер Пінг-Понгу на кількох ядрах")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=None, help="кількість процесів (типово - кількість ядер)")
+    parser.add_argument("--tick-rate", type=int, default=TICK_RATE, help="кроків симуляції за секунду")
+    parser.add_argument("--udp", action="store_true", help="дозволити знімки і введення по UDP; воркер N слухає порт+1+N")
+    parser.add_argument("--batch", action="store_true",
+                        help="крокувати всі матчі разом на NumPy (вигідно від ~200 одночасних матчів)")
+    parser.add_argument("--pairing", type=parse_pairing, default=PAIRING_FIFO, help="підбір суперників: fifo, region, skill або region,skill")
+    parser.add_argument("--replays", metavar="DIR", default=None, help="записувати реплеї матчів у каталог")
+    parser.add_argument("--seed", type=int, default=None, help="зерно для відтворюваних матчів")
+    args = parser.parse_args()
+    Supervisor(args.host, args.port, args.workers, args.tick_rate, args.udp, args.batch,
+               pairing=args.pairing, replay_dir=args.replays, seed=args.seed).run()
@@ -4,18 +4,76 @@
 
 import pygame
 import json
+from collections import OrderedDict
 from pathlib import Path
+from threading import Thread
 from typing import Dict, Tuple, Optional
 
+# Максимальний обсяг пам'яті під масштабовані копії зображень
+SCALED_CACHE_LIMIT = 32 * 1024 * 1024  # байт
+TEXT_CACHE_SIZE = 256  # скільки відрендерених написів тримати в пам'яті
+
+# Групи зображень: підкаталог, шаблон файлів, префікс назви, чи конвертувати з прозорістю
+IMAGE_GROUPS = (
+    ("backgrounds", "*.png", "", False),
+    ("balls", "*.png", "ball_", True),
+    ("paddles", "*.png", "paddle_", True),
+    ("buttons", "*.png", "btn_", True),
+    (".", "ui_*.png", "", True),
+)
+
+
+class TextCache:
+    """Кеш відрендерених написів: (шрифт, текст, колір, згладжування) -> поверхня.
+    Незмінні написи меню й рахунку малюються одним blit замість растеризації
+    шрифтом на кожному кадрі; найдавніше використані витісняються першими."""
+    
+    def __init__(self, size: int = TEXT_CACHE_SIZE):
+        self.size = size
+        self.surfaces = OrderedDict()
+    
+    def render(self, font: pygame.font.Font, text: str, antialias: bool, color) -> pygame.Surface:
+        """Те саме, що font.render(text, antialias, color), але з кешу"""
+        key = (font, text, tuple(color), antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+        surface = font.render(text, antialias, color)
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert_alpha()
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.size:
+            self.surfaces.popitem(last=False)
+        return surface
+    
+    def clear(self):
+        self.surfaces.clear()
+
+
+# Спільний кеш для клієнта і всіх екранів меню
+text_cache = TextCache()
+
+
 class ResourceManager:
     """Менеджер для завантаження та управління ресурсами"""
     
     def __init__(self, base_path: str = "."):
         self.base_path = Path(base_path)
         self.assets_path = self.base_path / "assets"
+        # Знайдені файли: назва -> (шлях, чи конвертувати з прозорістю, прямокутник
+        # в атласі або None); у images потрапляють лише вже прочитані зображення
+        self.image_files = {}
         self.images = {}
+        self.sheets = {}
         self.sounds = {}
         self.skins_config = {}
+        # Масштабовані та конвертовані під формат екрана копії: (назва, розмір) -> поверхня.
+        # Порядок - від найдавніше використаної, щоб витісняти її першою
+        self.scaled = OrderedDict()
+        self.scaled_bytes = 0
+        self.resolution = None
+        self.missing = set()
         self.load_all_resources()
     
     def load_all_resources(self):
@@ -24,58 +82,72 @@ class ResourceManager:
         self.load_skins_config()
     
     def load_images(self):
-        """Завантажити всі зображення"""
+        """Знайти всі зображення. Самі файли читаються при першому зверненні
+        або заздалегідь у фоні (prefetch), тож перший кадр не чекає на них"""
         images_dir = self.assets_path / "images"
         
         if not images_dir.exists():
             print(f"⚠️  Директорія з зображеннями не знайдена: {images_dir}")
             return
         
-        # Завантажити фони
-        bg_dir = images_dir / "backgrounds"
-        if bg_dir.exists():
-            for img_file in bg_dir.glob("*.png"):
-                try:
-                    self.images[img_file.stem] = pygame.image.load(str(img_file))
-                except Exception as e:
-                    print(f"❌ Помилка завантаження {img_file.name}: {e}")
-        
-        # Завантажити м'ячі
-        balls_dir = images_dir / "balls"
-        if balls_dir.exists():
-            for img_file in balls_dir.glob("*.png"):
-                try:
-                    self.images[f"ball_{img_file.stem}"] = pygame.image.load(str(img_file)).convert_alpha()
-                except Exception as e:
-                    print(f"❌ Помилка завантаження {img_file.name}: {e}")
+        for subdir, pattern, prefix, alpha in IMAGE_GROUPS:
+            group_dir = images_dir / subdir
+            if group_dir.exists():
+                for img_file in group_dir.glob(pattern):
+                    self.image_files[f"{prefix}{img_file.stem}"] = (img_file, alpha, None)
         
-        # Завантажити платформи
-        paddles_dir = images_dir / "paddles"
-        if paddles_dir.exists():
-            for img_file in paddles_dir.glob("*.png"):
-                try:
-                    self.images[f"paddle_{img_file.stem}"] = pygame.image.load(str(img_file)).convert_alpha()
-                except Exception as e:
-                    print(f"❌ Помилка завантаження {img_file.name}: {e}")
-        
-        # Завантажити кнопки
-        buttons_dir = images_dir / "buttons"
-        if buttons_dir.exists():
-            for img_file in buttons_dir.glob("*.png"):
-                try:
-                    self.images[f"btn_{img_file.stem}"] = pygame.image.load(str(img_file)).convert_alpha()
-                except Exception as e:
-                    print(f"❌ Помилка завантаження {img_file.name}: {e}")
+        # Атлас: спрайти з нього читаються одним файлом замість окремих PNG
+        atlas_index = images_dir / "atlas.json"
+        if atlas_index.exists():
+            try:
+                with open(atlas_index, 'r', encoding='utf-8') as f:
+                    atlas = json.load(f)
+                atlas_file = images_dir / atlas["image"]
+                for name, rect in atlas["sprites"].items():
+                    self.image_files[name] = (atlas_file, True, pygame.Rect(rect))
+                print(f"✓ Атлас: {len(atlas['sprites'])} спрайтів")
+            except Exception as e:
+                print(f"❌ Помилка завантаження атласу: {e}")
         
-        # Завантажити UI панелі
-        if images_dir.exists():
-            for img_file in images_dir.glob("ui_*.png"):
-                try:
-                    self.images[img_file.stem] = pygame.image.load(str(img_file)).convert_alpha()
-                except Exception as e:
-                    print(f"❌ Помилка завантаження {img_file.name}: {e}")
+        print(f"✓ Знайдено {len(self.image_files)} зображень")
+    
+    def load_image(self, name: str) -> Optional[pygame.Surface]:
+        """Прочитати зображення з диска, якщо воно ще не завантажене"""
+        img = self.images.get(name)
+        if img is not None or name not in self.image_files:
+            return img
         
-        print(f"✓ Завантажено {len(self.images)} зображень")
+        img_file, alpha, rect = self.image_files[name]
+        try:
+            if rect is not None:
+                img = self.load_sheet(img_file).subsurface(rect)
+            else:
+                img = pygame.image.load(str(img_file))
+                if alpha:
+                    img = img.convert_alpha()
+        except Exception as e:
+            print(f"❌ Помилка завантаження {img_file.name}: {e}")
+            return None
+        # Файл міг паралельно прочитати потік попереднього завантаження -
+        # лишаємо ту копію, що потрапила в словник першою
+        return self.images.setdefault(name, img)
+    
+    def load_sheet(self, path: Path) -> pygame.Surface:
+        """Атлас читається один раз, спрайти - його підповерхні"""
+        sheet = self.sheets.get(path)
+        if sheet is None:
+            sheet = self.sheets.setdefault(path, pygame.image.load(str(path)).convert_alpha())
+        return sheet
+    
+    def prefetch(self, names):
+        """Завантажити зображення у фоновому потоці, поки гравець на іншому екрані"""
+        names = [name for name in names if name in self.image_files and name not in self.images]
+        if names:
+            Thread(target=self._prefetch, args=(names,), daemon=True).start()
+    
+    def _prefetch(self, names):
+        for name in names:
+            self.load_image(name)
     
     def load_skins_config(self):
         """Завантажити конфіг скінів"""
@@ -92,16 +164,63 @@ class ResourceManager:
             print(f"⚠️  Конфіг скінів не знайдено: {config_file}")
     
     def get_image(self, name: str, size: Optional[Tuple[int, int]] = None) -> Optional[pygame.Surface]:
-        """Отримати зображення за назвою"""
-        if name not in self.images:
-            print(f"⚠️  Зображення не знайдено: {name}")
+        """Отримати зображення за назвою.
+        З розміром повертається масштабована копія з кешу: масштабування і
+        конвертація у формат екрана відбуваються лише при першому запиті."""
+        if name not in self.image_files:
+            # Попереджаємо один раз, а не на кожному кадрі
+            if name not in self.missing:
+                self.missing.add(name)
+                print(f"⚠️  Зображення не знайдено: {name}")
             return None
         
-        img = self.images[name]
-        if size:
-            img = pygame.transform.scale(img, size)
+        img = self.load_image(name)
+        if img is None or not size:
+            return img
+        
+        self.check_resolution()
+        key = (name, tuple(size))
+        cached = self.scaled.get(key)
+        if cached is not None:
+            self.scaled.move_to_end(key)
+            return cached
+        
+        img = self.convert(pygame.transform.scale(img, size))
+        self.scaled[key] = img
+        self.scaled_bytes += self.surface_bytes(img)
+        # Витіснити найдавніше використані копії, але не щойно створену
+        while self.scaled_bytes > SCALED_CACHE_LIMIT and len(self.scaled) > 1:
+            _, evicted = self.scaled.popitem(last=False)
+            self.scaled_bytes -= self.surface_bytes(evicted)
         return img
     
+    def check_resolution(self):
+        """Скинути кеш масштабованих зображень і написів, якщо змінився режим екрана:
+        обидва зберігають поверхні, перетворені у формат старого екрана"""
+        surface = pygame.display.get_surface()
+        resolution = (surface.get_size(), surface.get_bitsize()) if surface else None
+        if resolution != self.resolution:
+            self.resolution = resolution
+            self.clear_scaled()
+            text_cache.clear()
+    
+    def clear_scaled(self):
+        self.scaled.clear()
+        self.scaled_bytes = 0
+    
+    @staticmethod
+    def convert(img: pygame.Surface) -> pygame.Surface:
+        """Привести поверхню до формату екрана, щоб blit не конвертував пікселі щоразу"""
+        if pygame.display.get_surface() is None:
+            return img
+        if img.get_flags() & pygame.SRCALPHA:
+            return img.convert_alpha()
+        return img.convert()
+    
+    @staticmethod
+    def surface_bytes(img: pygame.Surface) -> int:
+        return img.get_width() * img.get_height() * img.get_bytesize()
+    
     def get_skin_data(self, skin_type: str) -> list:
         """Отримати дані скінів певного типу"""
         return self.skins_config.get(skin_type, [])
@@ -144,18 +263,54 @@ class Button:
         
         # Текст на кнопці
         if self.text:
-            text_surface = font.render(self.text, True, (255, 255, 255))
+            text_surface = text_cache.render(font, self.text, True, (255, 255, 255))
             text_rect = text_surface.get_rect(center=self.rect.center)
             screen.blit(text_surface, text_rect)
 
 
-class SkinShop:
-    """Магазин скінів"""
+class LayeredScreen:
+    """Екран меню з нерухомим вмістом, запеченим в одну поверхню.
+    
+    Фон, заголовок, кнопки й написи малюються в шар лише тоді, коли
+    змінюється те, від чого вони залежать (layer_state), а кожен кадр -
+    це один blit шару і малювання динамічних елементів поверх нього.
+    """
     
     def __init__(self, resource_manager: ResourceManager, screen_width: int, screen_height: int):
         self.resource_manager = resource_manager
         self.screen_width = screen_width
         self.screen_height = screen_height
+        self.layer = None
+        self.layer_key = None
+    
+    def layer_state(self) -> tuple:
+        """Стан, від якого залежить вміст шару"""
+        return ()
+    
+    def draw_layer(self, surface: pygame.Surface, font: pygame.font.Font, large_font: pygame.font.Font):
+        """Намалювати нерухомий вміст екрана"""
+    
+    def draw_overlay(self, screen: pygame.Surface, font: pygame.font.Font, large_font: pygame.font.Font):
+        """Намалювати те, що змінюється щокадру"""
+    
+    def draw(self, screen: pygame.Surface, font: pygame.font.Font, large_font: pygame.font.Font):
+        """Малювати екран"""
+        key = (screen.get_size(), font, large_font, self.layer_state())
+        if key != self.layer_key:
+            self.layer = pygame.Surface(screen.get_size())
+            if pygame.display.get_surface() is not None:
+                self.layer = self.layer.convert()
+            self.draw_layer(self.layer, font, large_font)
+            self.layer_key = key
+        screen.blit(self.layer, (0, 0))
+        self.draw_overlay(screen, font, large_font)
+
+
+class SkinShop(LayeredScreen):
+    """Магазин скінів"""
+    
+    def __init__(self, resource_manager: ResourceManager, screen_width: int, screen_height: int):
+        super().__init__(resource_manager, screen_width, screen_height)
         self.current_tab = "balls"  # "balls" або "paddles"
         self.player_coins = 500  # Поточні монети гравця
         self.selected_ball = "ball_white"
@@ -207,18 +362,22 @@ class SkinShop:
         
         return None
     
-    def draw(self, screen: pygame.Surface, font: pygame.font.Font, large_font: pygame.font.Font):
+    def layer_state(self) -> tuple:
+        hovered = tuple(button.hovered for button in self.buttons.values())
+        return (self.current_tab, self.player_coins, self.selected_ball, self.selected_paddle, hovered)
+    
+    def draw_layer(self, screen: pygame.Surface, font: pygame.font.Font, large_font: pygame.font.Font):
         """Малювати магазин"""
         # Фон
-        bg = self.resource_manager.get_image("ui_shop")
+        bg = self.resource_manager.get_image("ui_shop", (self.screen_width, self.screen_height))
+        # Панель напівпрозора: раніше вона накладалась на попередній кадр,
+        # тепер - на колір фону магазину
+        screen.fill((20, 20, 40))
         if bg:
-            bg = pygame.transform.scale(bg, (self.screen_width, self.screen_height))
             screen.blit(bg, (0, 0))
-        else:
-            screen.fill((20, 20, 40))
         
         # Заголовок
-        title = large_font.render("МАГАЗИН СКІНІВ", True, (255, 200, 100))
+        title = text_cache.render(large_font, "МАГАЗИН СКІНІВ", True, (255, 200, 100))
         screen.blit(title, (self.screen_width // 2 - title.get_width() // 2, 20))
         
         # Вкладки
@@ -227,7 +386,7 @@ class SkinShop:
         self.buttons["back"].draw(screen, font)
         
         # Монети
-        coins_text = font.render(f"Монети: {self.player_coins}", True, (255, 200, 100))
+        coins_text = text_cache.render(font, f"Монети: {self.player_coins}", True, (255, 200, 100))
         screen.blit(coins_text, (20, self.screen_height - 40))
         
         # Список скінів поточної вкладки
@@ -240,8 +399,8 @@ class SkinShop:
                 button.draw(screen, font)
                 
                 # Інформація про скін
-                name_text = font.render(skin['name'], True, (255, 255, 255))
-                price_text = font.render(f"💰 {skin['price']}", True, (255, 200, 0))
+                name_text = text_cache.render(font, skin['name'], True, (255, 255, 255))
+                price_text = text_cache.render(font, f"💰 {skin['price']}", True, (255, 200, 0))
                 
                 screen.blit(name_text, (button.rect.x, button.rect.y + 100))
                 screen.blit(price_text, (button.rect.x, button.rect.y + 120))
@@ -252,13 +411,11 @@ class SkinShop:
                     pygame.draw.rect(screen, (0, 255, 0), button.rect, 3)
 
 
-class GameMenu:
+class GameMenu(LayeredScreen):
     """Головне меню гри"""
     
     def __init__(self, resource_manager: ResourceManager, screen_width: int, screen_height: int):
-        self.resource_manager = resource_manager
-        self.screen_width = screen_width
-        self.screen_height = screen_height
+        super().__init__(resource_manager, screen_width, screen_height)
         self.buttons = {
             "play": Button(screen_width // 2 - 100, 200, 200, 60, "Грати", (100, 200, 100)),
             "settings": Button(screen_width // 2 - 100, 300, 200, 60, "Налаштування", (100, 150, 200)),
@@ -273,18 +430,20 @@ class GameMenu:
                 return action
         return None
     
-    def draw(self, screen: pygame.Surface, font: pygame.font.Font, large_font: pygame.font.Font):
+    def layer_state(self) -> tuple:
+        return tuple(button.hovered for button in self.buttons.values())
+    
+    def draw_layer(self, screen: pygame.Surface, font: pygame.font.Font, large_font: pygame.font.Font):
         """Малювати меню"""
         # Фон
-        bg = self.resource_manager.get_image("bg_menu")
+        bg = self.resource_manager.get_image("bg_menu", (self.screen_width, self.screen_height))
         if bg:
-            bg = pygame.transform.scale(bg, (self.screen_width, self.screen_height))
             screen.blit(bg, (0, 0))
         else:
             screen.fill((30, 10, 50))
         
         # Заголовок
-        title = large_font.render("ПІНГ-ПОНГ", True, (255, 100, 200))
+        title = text_cache.render(large_font, "ПІНГ-ПОНГ", True, (255, 100, 200))
         screen.blit(title, (self.screen_width // 2 - title.get_width() // 2, 50))
         
         # Кнопки
@@ -292,13 +451,11 @@ class GameMenu:
             button.draw(screen, font)
 
 
-class PlayerSettings:
+class PlayerSettings(LayeredScreen):
     """Налаштування гравця"""
     
     def __init__(self, resource_manager: ResourceManager, screen_width: int, screen_height: int):
-        self.resource_manager = resource_manager
-        self.screen_width = screen_width
-        self.screen_height = screen_height
+        super().__init__(resource_manager, screen_width, screen_height)
         self.player_name = ""
         self.selected_ball_skin = "ball_white"
         self.selected_paddle_skin = "paddle_magenta"
@@ -318,22 +475,24 @@ class PlayerSettings:
         
         return None
     
-    def draw(self, screen: pygame.Surface, font: pygame.font.Font, large_font: pygame.font.Font):
+    def layer_state(self) -> tuple:
+        return (self.selected_ball_skin, self.selected_paddle_skin, self.back_button.hovered)
+    
+    def draw_layer(self, screen: pygame.Surface, font: pygame.font.Font, large_font: pygame.font.Font):
         """Малювати налаштування"""
         # Фон
-        bg = self.resource_manager.get_image("bg_settings")
+        bg = self.resource_manager.get_image("bg_settings", (self.screen_width, self.screen_height))
         if bg:
-            bg = pygame.transform.scale(bg, (self.screen_width, self.screen_height))
             screen.blit(bg, (0, 0))
         else:
             screen.fill((20, 10, 30))
         
         # Заголовок
-        title = large_font.render("НАЛАШТУВАННЯ", True, (200, 150, 255))
+        title = text_cache.render(large_font, "НАЛАШТУВАННЯ", True, (200, 150, 255))
         screen.blit(title, (self.screen_width // 2 - title.get_width() // 2, 30))
         
         # Введення імені
-        name_label = font.render("Ім'я гравця:", True, (255, 255, 255))
+        name_label = text_cache.render(font, "Ім'я гравця:", True, (255, 255, 255))
         screen.blit(name_label, (100, 150))
         
         # Поле вводу
@@ -341,14 +500,16 @@ class PlayerSettings:
         pygame.draw.rect(screen, (50, 50, 80), input_rect)
         pygame.draw.rect(screen, (200, 200, 200), input_rect, 2)
         
-        name_text = font.render(self.player_name, True, (255, 255, 255))
-        screen.blit(name_text, (110, 210))
-        
         # Інформація про скіни
-        ball_label = font.render(f"М'яч: {self.selected_ball_skin}", True, (255, 200, 100))
-        paddle_label = font.render(f"Платформа: {self.selected_paddle_skin}", True, (255, 200, 100))
+        ball_label = text_cache.render(font, f"М'яч: {self.selected_ball_skin}", True, (255, 200, 100))
+        paddle_label = text_cache.render(font, f"Платформа: {self.selected_paddle_skin}", True, (255, 200, 100))
         screen.blit(ball_label, (100, 300))
         screen.blit(paddle_label, (100, 350))
         
         # Кнопка назад
         self.back_button.draw(screen, font)
+    
+    def draw_overlay(self, screen: pygame.Surface, font: pygame.font.Font, large_font: pygame.font.Font):
+        """Ім'я, що вводиться"""
+        name_text = text_cache.render(font, self.player_name, True, (255, 255, 255))
+        screen.blit(name_text, (110, 210))